@@ -1,16 +1,37 @@
+import functools
+import os
+
 import streamlit as st
-import numpy as np
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import leafmap.foliumap as leafmap
-import folium
 import streamlit_antd_components as sac
-import requests
-import json
-import requests
 import streamlit.components.v1 as components
-from folium import Popup
+from poluicao import CAUSA_TOTAL, formatar_em_milhoes, formatar_numero, formatar_taxa
+from poluicao.geo import CAMINHO_GEOJSON
+from poluicao.ingestao import indicadores
+from poluicao.instrumentacao import etapa, execucao, finalizar_execucao, iniciar_execucao, servir_metricas
+from poluicao.graficos import (
+    grafico_causa_anos,
+    grafico_pais,
+    grafico_tendencia_ano,
+    grafico_tendencia_continente,
+    grafico_total_causa,
+    grafico_total_continente,
+)
+from poluicao.mapa import N_PAISES_MAPA, renderizar_mapa
+from poluicao.painel import carregar_agregados, fonte
+from poluicao.remoto import aguardar, buscar_em_segundo_plano
+
+iniciar_execucao()
+
+if os.environ.get('POLUICAO_METRICAS_PORTA'):
+    servir_metricas(int(os.environ['POLUICAO_METRICAS_PORTA']))
+
+# Com POLUICAO_GEOJSON_URL as fronteiras vêm dessa URL: o download começa
+# aqui, corre junto com o resto da página e, se falhar ou demorar, o mapa
+# usa o arquivo que acompanha o pacote.
+url_geojson = os.environ.get('POLUICAO_GEOJSON_URL')
+if url_geojson:
+    futuro_geojson = buscar_em_segundo_plano(url_geojson, reserva=CAMINHO_GEOJSON)
 
 st.markdown(
     """
@@ -104,547 +125,358 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-df = pd.read_csv('data.csv')
-
-df = df.drop(['ValueType', 'SpatialDimValueCode', 'FactValueUoM', 
-              'FactValueNumericLowPrefix', 'FactValueNumericLow', 
-              'FactValueNumericHighPrefix', 'FactValueNumericHigh',
-              'Dim3ValueCode', 'DataSourceDimValueCode', 'DataSource',
-              'FactValueNumericPrefix', 'FactValueTranslationID', 'FactComments',
-              'Dim3 type', 'Dim3', 'IndicatorCode', 'Indicator',
-              'Location type', 'Period type', 'Dim1 type', 'Dim2 type',
-              'Language', 'DateModified', 'Value', 'IsLatestYear'], axis=1)
-df = df.drop(df[df['Period'] < 2014].index)
-df = df.drop(df[df['Dim1ValueCode'].isin(['SEX_MLE', 'SEX_FMLE'])].index)
-df = df.drop(['Dim1', 'Dim1ValueCode'], axis=1)
-df['FactValueNumeric'] = df['FactValueNumeric'].round().astype(int)
-
-
-df.rename(columns={
-    'ParentLocationCode': 'continente_code',
-    'ParentLocation': 'continente',
-    'Location': 'pais',
-    'Period': 'ano',
-    'Dim2': 'causa',
-    'Dim2ValueCode': 'causa_code',
-    'FactValueNumeric': 'mortes'
-}, inplace=True)
-
-total_mortes = df[df['causa'] == 'ALL CAUSES']['mortes'].sum()
-
-renomear_continentes = {
-    'Americas': 'Américas',
-    'Africa': 'África',
-    'Western Pacific': 'Pacífico Ocidental',
-    'Europe': 'Europa',
-    'South-East Asia': 'Sudeste Asiático',
-    'Eastern Mediterranean': 'Mediterrâneo Oriental'
-}
-
-df['continente'] = df['continente'].replace(renomear_continentes)
-
-def formatar_numero(valor):
-    if valor >= 1_000_000:
-        return f"{valor / 1_000_000:.1f}M"
-    elif valor >= 1_000:
-        return f"{valor / 1_000:.1f}K"
-    else:
-        return str(valor)
-    
-traducao_causas = {
-    "ALL CAUSES": "Todas as causas",
-    "Trachea, bronchus, lung cancers": "Câncer",
-    "Chronic obstructive pulmonary disease": "Obstrução da respiração",
-    "Acute lower respiratory infections": "Infecções respiratórias",
-    "Stroke": "AVC",
-    "Ischaemic heart disease": "Doença cardíaca isquêmica"
-}
-df['causa'] = df['causa'].replace(traducao_causas)
-
-mortes_por_continente = df.groupby('continente')['mortes'].sum()
-continente_mais_mortes = mortes_por_continente.idxmax()
-pais_mais_mortes = df.groupby('pais')['mortes'].sum().idxmax()
-mortes_pais_mais_mortes = df.groupby('pais')['mortes'].sum().max()
-mortes_em_2018 = df[df['ano'] == 2018]['mortes'].sum()
+# Com POLUICAO_LOJA apontando para uma loja gerada por
+# `python -m poluicao ingerir`, o indicador exibido é escolhido na barra lateral.
+loja = os.environ.get('POLUICAO_LOJA')
+catalogo = indicadores(loja) if loja else {}
 
-st.markdown("<div style='margin-top: 50px;'></div>", unsafe_allow_html=True)
+if catalogo:
+    indicador = st.sidebar.selectbox(
+        "Indicador",
+        options=list(catalogo),
+        format_func=lambda codigo: catalogo[codigo]['nome']
+    )
 
-st.title("Mortes atribuídas à poluição do ar no ano de 2014 ~ 2019")
+# POLUICAO_BACKEND escolhe onde ficam os agregados: pandas (padrão),
+# compartilhado, sqlite ou duckdb (ver poluicao.painel.carregar_agregados).
+backend = os.environ.get('POLUICAO_BACKEND', 'pandas')
 
-def formatar_em_milhoes(valor):
-    if valor >= 1_000_000:
-        return f"{int(valor / 1_000_000)} milhões"
-    return str(valor)
+agregados = carregar_agregados(*fonte(indicador if catalogo else None, loja), backend)
 
-col1, col2, col3, col4 = st.columns(4)
+# Indicadores que são taxas (por 100 mil habitantes, padronizadas por
+# idade...) não se somam entre países nem anos: os cartões, o mapa e os
+# detalhes mostram os valores de um ano, e as views de totais ficam de fora.
+taxa = not agregados.contagem
+if taxa:
+    ano_recente = agregados.anos[-1]
+    causa_taxa = CAUSA_TOTAL if CAUSA_TOTAL in agregados.causas else agregados.causas[0]
+    valores_recentes = agregados.ranking_paises(ano=ano_recente, causa=causa_taxa)
 
-with col3:
-    st.markdown(
-        f"""
-        <div class="custom-card-white">
-            <div class="title">País com mais mortes</div>
-            <div class="text">{pais_mais_mortes} ({formatar_numero(mortes_pais_mais_mortes)})</div>
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+total_mortes = agregados.total_mortes
 
-with col4:
-    st.markdown(
-        f"""
-        <div class="custom-card">
-            <div class="title">Em 2018</div>
-            <div class="text">{formatar_em_milhoes(mortes_em_2018)}</div>
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+with etapa('kpis'):
+    continente_mais_mortes = agregados.continente_mais_mortes
+    pais_mais_mortes = agregados.pais_mais_mortes
+    mortes_pais_mais_mortes = agregados.mortes_pais_mais_mortes
+    mortes_em_2018 = agregados.mortes_ano_geral(2018)
 
-with col1:
-    st.markdown(
-        f"""
-        <div class="custom-card">
-            <div class="title">Mais de</div>
-            <div class="text">{formatar_em_milhoes(total_mortes)}</div>
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+st.markdown("<div style='margin-top: 50px;'></div>", unsafe_allow_html=True)
 
-with col2:
-    st.markdown(
-        f"""
-        <div class="custom-card-white">
-            <div class="title">Região com mais mortes</div>
-            <div class="text">{continente_mais_mortes}</div>
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+if catalogo:
+    st.title(catalogo[indicador]['nome'])
+else:
+    st.title("Mortes atribuídas à poluição do ar no ano de 2014 ~ 2019")
 
-st.markdown("<div style='margin-bottom: 50px;'></div>", unsafe_allow_html=True)
+col1, col2, col3, col4 = st.columns(4)
 
-col1, col2 = st.columns([1, 3])
-
-with col1:
-    btn = sac.buttons(
-    items=["Total de Mortes por Continente", "Tendência de Mortes por Continente", "Causas das mortes ao longo dos anos", "Tendência de Mortes por Ano", "Total de Mortes por Causa"],
-    index=0,
-    format_func='title',
-    align='center',
-    direction='horizontal',
-    radius='lg',
-    return_index=False,
-    color='#4682b4',
-    size=15,
-    )
 
-with col2:
-    if btn == "Total de Mortes por Continente":
+def cartao(coluna, classe, titulo, texto):
+    with coluna:
+        st.markdown(
+            f"""
+            <div class="{classe}">
+                <div class="title">{titulo}</div>
+                <div class="text">{texto}</div>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
 
-        col1, col2 = st.columns([2, 3])
-        
-        with col2:
-            continente_selecionado = st.selectbox("Selecione um Continente", options=df['continente'].unique())
-            mortes_continente_selec = df[(df['causa'] == 'Todas as causas') & (df['continente'] == continente_selecionado)]['mortes'].sum()
 
-        with col1:
-            total_mortes_continente = df[df['causa'] == 'Todas as causas']['mortes'].sum()
-            
-            st.markdown("<div class='title-text'>Total de mortes</div>", unsafe_allow_html=True)
-            st.markdown(
-                f"<div class='total-mortes'><span class='highlight'>{mortes_continente_selec:,}</span>/{total_mortes_continente:,}</div>",
-                unsafe_allow_html=True
-            )
+if taxa:
+    maior, menor = valores_recentes.iloc[0], valores_recentes.iloc[-1]
+    cartao(col1, "custom-card", "Ano mais recente", ano_recente)
+    cartao(col2, "custom-card-white", f"Maior valor em {ano_recente}",
+           f"{maior['pais']} ({formatar_taxa(maior['mortes'])})")
+    cartao(col3, "custom-card-white", f"Menor valor em {ano_recente}",
+           f"{menor['pais']} ({formatar_taxa(menor['mortes'])})")
+    cartao(col4, "custom-card", f"Mediana dos países em {ano_recente}",
+           formatar_taxa(valores_recentes['mortes'].median()))
+    pais_mais_mortes = maior['pais']
+
+else:
+    cartao(col1, "custom-card", "Mais de", formatar_em_milhoes(total_mortes))
+    cartao(col2, "custom-card-white", "Região com mais mortes", continente_mais_mortes)
+    cartao(col3, "custom-card-white", "País com mais mortes",
+           f"{pais_mais_mortes} ({formatar_numero(mortes_pais_mais_mortes)})")
+    cartao(col4, "custom-card", "Em 2018", formatar_em_milhoes(mortes_em_2018))
 
-        mortes_por_continente = df[df['causa'] == 'Todas as causas'].groupby('continente')['mortes'].sum()
-        
-        colors = ['#EAEBF8' if continente != continente_selecionado else '#3867D6' for continente in mortes_por_continente.index]
-
-        fig = go.Figure(data=[
-            go.Bar(
-                x=mortes_por_continente.index,
-                y=mortes_por_continente.values,
-                marker_color=colors,
-                textposition="none",
-                hoverinfo="x+y"
-            )
-        ])
-
-        fig.update_layout(
-            title="",
-            xaxis=dict(
-                tickangle=0,
-                tickmode="array",
-                tickvals=list(mortes_por_continente.index),
-                ticktext=[f"<br>".join(continent.split()) for continent in mortes_por_continente.index],
-            ),
-            yaxis=dict(
-                showticklabels=False,
-                showgrid=False
-            ),
-            font=dict(size=14, color="black"),
-            plot_bgcolor="rgba(0, 0, 0, 0)",
-            showlegend=False,
-            margin=dict(l=20, r=20, t=20, b=20),
-        )
+st.markdown("<div style='margin-bottom: 50px;'></div>", unsafe_allow_html=True)
 
-        fig.add_shape(
-            type="line",
-            x0=-0.5, x1=len(mortes_por_continente.index) - 0.5,
-            y0=mortes_continente_selec, y1=mortes_continente_selec,
-            line=dict(color="#3867D6", width=2, dash="dash")
+def mostrar_tempos(titulo, tempo_total, tempos):
+    # Com POLUICAO_DEBUG, no container corrente.
+    if os.environ.get('POLUICAO_DEBUG'):
+        st.markdown(f"### {titulo}")
+        st.table(pd.DataFrame({
+            'etapa': list(tempos),
+            'ms': [round(segundos * 1000, 2) for segundos in tempos.values()]
+        }))
+        st.caption(f"Total: {tempo_total * 1000:.1f} ms")
+
+
+def secao(escopo):
+    # Cada seção é um st.fragment: quando um widget dela muda, só a seção
+    # reexecuta, sem refazer os cartões nem as outras seções. Esse rerun
+    # parcial é medido como uma execução própria (log e /metrics), e os
+    # tempos de debug dele aparecem no fim da própria seção: um fragmento
+    # não pode reescrever a barra lateral.
+    def decorar(funcao):
+        @st.fragment
+        @functools.wraps(funcao)
+        def fragmento(*args, **kwargs):
+            with execucao(escopo) as resultado:
+                funcao(*args, **kwargs)
+            if resultado:
+                mostrar_tempos("Tempos desta seção", resultado['total'], resultado['tempos'])
+        return fragmento
+    return decorar
+
+
+@secao('graficos')
+def secao_graficos():
+    col1, col2 = st.columns([1, 3])
+
+    with col1:
+        btn = sac.buttons(
+        items=["Total de Mortes por Continente", "Tendência de Mortes por Continente", "Causas das mortes ao longo dos anos", "Tendência de Mortes por Ano", "Total de Mortes por Causa"],
+        index=0,
+        format_func='title',
+        align='center',
+        direction='horizontal',
+        radius='lg',
+        return_index=False,
+        color='#4682b4',
+        size=15,
         )
+
+    with col2:
+        if btn == "Total de Mortes por Continente":
+
+            col1, col2 = st.columns([2, 3])
         
-        fig.add_annotation(
-            x=len(mortes_por_continente.index) - 0.5,
-            y=mortes_continente_selec,
-            text=f"{formatar_numero(mortes_continente_selec)}",
-            showarrow=False,
-            font=dict(color="#3867D6", size=12),
-            align="right",
-            xanchor="left",
-            yanchor="middle"
-        )
+            with col2:
+                continente_selecionado = st.selectbox("Selecione um Continente", options=agregados.continentes)
+                mortes_continente_selec = agregados.mortes_continente(continente_selecionado)
 
-        st.plotly_chart(fig, use_container_width=True)
+            with col1:
+                total_mortes_continente = total_mortes
+            
+                st.markdown("<div class='title-text'>Total de mortes</div>", unsafe_allow_html=True)
+                st.markdown(
+                    f"<div class='total-mortes'><span class='highlight'>{mortes_continente_selec:,}</span>/{total_mortes_continente:,}</div>",
+                    unsafe_allow_html=True
+                )
+
+            with etapa('figura'):
+                fig = grafico_total_continente(agregados, continente_selecionado)
+            with etapa('envio_grafico'):
+                st.plotly_chart(fig, use_container_width=True)
 
-    elif btn == "Tendência de Mortes por Continente":
+        elif btn == "Tendência de Mortes por Continente":
 
-        col1, col2 = st.columns([2, 3])
+            col1, col2 = st.columns([2, 3])
 
         
-        mortes_anuais_por_continente = df[df['causa'] == 'Todas as causas'].groupby(['continente', 'ano'])['mortes'].sum().reset_index()
-        mortes_anuais_por_continente['ano'] = mortes_anuais_por_continente['ano'].astype(int)
-        mortes_anuais_por_continente['mortes_formatado'] = mortes_anuais_por_continente['mortes'].apply(formatar_numero)
-
-        with col2:
-            continente_selecionado = st.selectbox(
-                "Selecione um Continente para destacar",
-                options=df['continente'].unique(),
-                index=0
-            )
+            with col2:
+                continente_selecionado = st.selectbox(
+                    "Selecione um Continente para destacar",
+                    options=agregados.continentes,
+                    index=0
+                )
         
-        dados_selecionados = mortes_anuais_por_continente[
-            mortes_anuais_por_continente['continente'] == continente_selecionado
-        ]
-
-    
-        total_mortes_continente = dados_selecionados['mortes'].sum()
+            total_mortes_continente = agregados.serie_continente(continente_selecionado).sum()
 
    
-        with col1:
-            st.markdown("<div class='title-text'>Total de mortes</div>", unsafe_allow_html=True)
-            st.markdown(f"<div class='total-mortes'>{total_mortes_continente:,}</div>",unsafe_allow_html=True)
-
-        fig = go.Figure()
-
-        fig.add_trace(
-            go.Scatter(
-                x=dados_selecionados['ano'],
-                y=dados_selecionados['mortes'],
-                mode='lines+markers+text',
-                name=continente_selecionado,
-                line=dict(dash='dash', shape='spline', color="#3867D6"),
-                marker=dict(size=13, color="#3867D6"),
-                text=dados_selecionados['mortes_formatado'],
-                textposition="top center",
-                textfont=dict(size=12, color="#3867D6")
-            )
-        )
+            with col1:
+                st.markdown("<div class='title-text'>Total de mortes</div>", unsafe_allow_html=True)
+                st.markdown(f"<div class='total-mortes'>{total_mortes_continente:,}</div>",unsafe_allow_html=True)
 
-        fig.update_layout(
-            xaxis=dict(showgrid=False, title=""),
-            yaxis=dict(showgrid=False, showticklabels=False, title=""),
-            plot_bgcolor="rgba(0, 0, 0, 0)",
-            font=dict(size=14, color="black"),
-            showlegend=False,
-            margin=dict(l=20, r=20, t=20, b=20),
-        )
+            with etapa('figura'):
+                fig = grafico_tendencia_continente(agregados, continente_selecionado)
+            with etapa('envio_grafico'):
+                st.plotly_chart(fig, use_container_width=True)
+        elif btn == "Causas das mortes ao longo dos anos":
 
-        st.plotly_chart(fig, use_container_width=True)
-    elif btn == "Causas das mortes ao longo dos anos":
+            col1, col2 = st.columns([2, 3])
 
-        col1, col2 = st.columns([2, 3])
+            # causas_traduzidas = ["Todas as causas"] + [traducao_causas.get(causa, causa) for causa in df['causa'].unique() if causa != "ALL CAUSES"]
 
-        # causas_traduzidas = ["Todas as causas"] + [traducao_causas.get(causa, causa) for causa in df['causa'].unique() if causa != "ALL CAUSES"]
+            with col2:
+                causa_selec = st.selectbox("Selecione uma Causa", options=agregados.causas)
+            # causa_selecionada = {v: k for k, v in traducao_causas.items()}.get(causa_traduzida_selecionada, causa_traduzida_selecionada)
+            total_mortes_causa = agregados.mortes_causa(causa_selec)
 
-        with col2:
-            causa_selec = st.selectbox("Selecione uma Causa", options=df['causa'].unique())
-        # causa_selecionada = {v: k for k, v in traducao_causas.items()}.get(causa_traduzida_selecionada, causa_traduzida_selecionada)
-        mortes_causa_selec = df[df['causa'] == causa_selec]['mortes'].sum()
-            # causa_traduzida_selecionada = st.selectbox("Selecione uma Causa", options=causas_traduzidas, index=0)
-
-        # causa_selecionada = {v: k for k, v in traducao_causas.items()}.get(causa_traduzida_selecionada, causa_traduzida_selecionada)
+            with col1:
+                st.markdown("<div class='title-text'>Total de mortes</div>", unsafe_allow_html=True)
+                st.markdown(f"<div class='total-mortes'>{total_mortes_causa:,}</div>",unsafe_allow_html=True)
 
-        dados_filtrados = df[df['causa'] == causa_selec].groupby(['ano'])['mortes'].sum().reset_index()
-        total_mortes_causa = df[df['causa'] == causa_selec]['mortes'].sum()
+            with etapa('figura'):
+                fig = grafico_causa_anos(agregados, causa_selec)
+            with etapa('envio_grafico'):
+                st.plotly_chart(fig)
 
-        with col1:
-            st.markdown("<div class='title-text'>Total de mortes</div>", unsafe_allow_html=True)
-            st.markdown(f"<div class='total-mortes'>{total_mortes_causa:,}</div>",unsafe_allow_html=True)
-            
-        dados_filtrados['mortes_formatado'] = dados_filtrados['mortes'].apply(formatar_numero)
+        elif btn == "Tendência de Mortes por Ano":
         
-        fig = go.Figure()
-        fig.add_trace(
-            go.Scatter(
-                x=dados_filtrados['ano'],
-                y=dados_filtrados['mortes'],
-                mode='lines+markers+text',
-                marker=dict(size=13),
-                line=dict(dash='dash', shape='spline', color="#3867D6"),
-                text=dados_filtrados['mortes_formatado'],
-                textposition="top center",
-                textfont=dict(size=13, color="#3867D6")
-            )
-        )
+            col1, col2 = st.columns([2, 3])
+
+            anos = ["Todos os anos"] + agregados.anos
         
-        fig.update_layout(legend_title_text='Causa')
-        fig.update_yaxes(showticklabels=False, title_text='', showgrid=False)
-        fig.update_xaxes(showgrid=False)
+            with col2:
+                ano_selecionado = st.selectbox("Selecione um Ano", options=anos, index=0)
 
-        st.plotly_chart(fig)
+            with col1:
+                if ano_selecionado == "Todos os anos":
+                    st.markdown("<div class='title-text'>Total de mortes</div>", unsafe_allow_html=True)
+                    st.markdown(f"<div class='total-mortes'>{total_mortes:,}</div>",unsafe_allow_html=True)
+                else:
+                    mortes_ano = agregados.mortes_ano(ano_selecionado)
+                    st.markdown("<div class='title-text'>Total de mortes</div>", unsafe_allow_html=True)
+                    st.markdown(f"<div class='total-mortes'><span class='highlight'>{mortes_ano:,.0f}</span>/{total_mortes:,}</div>",unsafe_allow_html=True)
 
-    elif btn == "Tendência de Mortes por Ano":
-        
-        col1, col2 = st.columns([2, 3])
+            with etapa('figura'):
+                fig = grafico_tendencia_ano(agregados, None if ano_selecionado == "Todos os anos" else ano_selecionado)
+            with etapa('envio_grafico'):
+                st.plotly_chart(fig, use_container_width=True)
 
-        mortes_anuais = df[df['causa'] == 'Todas as causas'].groupby(['ano'])['mortes'].sum().reset_index()
-        # total_mortes = mortes_anuais['mortes'].sum()
+        elif btn == "Total de Mortes por Causa":
+            col1, col2 = st.columns([2, 3])
 
-        anos = ["Todos os anos"] + list(mortes_anuais['ano'].unique())
-        
-        with col2:
-            ano_selecionado = st.selectbox("Selecione um Ano", options=anos, index=0)
+            with col2:
+                causa_selec = st.selectbox("Selecione uma Causa", options=agregados.causas)
+            mortes_causa_selec = agregados.mortes_causa(causa_selec)
 
-        with col1:
-            if ano_selecionado == "Todos os anos":
-                st.markdown("<div class='title-text'>Total de mortes</div>", unsafe_allow_html=True)
-                st.markdown(f"<div class='total-mortes'>{total_mortes:,}</div>",unsafe_allow_html=True)
-            else:
-                mortes_ano = mortes_anuais[mortes_anuais['ano'] == ano_selecionado]['mortes'].values[0]
-                # st.markdown("<span style='font-size:16px; margin:0;'>Mortes selecionadas / Total:</span>", unsafe_allow_html=True)
-                # st.markdown(f"<h4 style='font-size:38px; margin:0;'>{mortes_ano:,.0f} / {total_mortes:,.0f}</h4>", unsafe_allow_html=True)
+
+            with col1:
                 st.markdown("<div class='title-text'>Total de mortes</div>", unsafe_allow_html=True)
-                st.markdown(f"<div class='total-mortes'><span class='highlight'>{mortes_ano:,.0f}</span>/{total_mortes:,}</div>",unsafe_allow_html=True)
+                st.markdown(
+                    f"<div class='total-mortes'><span class='highlight'>{mortes_causa_selec:,}</span>/{total_mortes:,}</div>",
+                    unsafe_allow_html=True
+                )
 
-        fig = go.Figure()
-        
-        
-        fig.add_trace(
-            go.Scatter(
-                x=mortes_anuais['ano'],
-                y=mortes_anuais['mortes'],
-                mode='lines',
-                line=dict(dash='dash', shape='spline', color="#3867D6"),
-            )
+            with etapa('figura'):
+                fig = grafico_total_causa(agregados, causa_selec)
+            with etapa('envio_grafico'):
+                st.plotly_chart(fig, use_container_width=True)
+
+
+#=============================================================================================
+#Mapa
+
+@secao('mapa')
+def secao_mapa():
+    titulo_mapa = st.empty()
+
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        mapa_mundo = st.checkbox("Mostrar todos os países")
+
+    with col2:
+        n_paises = st.number_input(
+            "Quantidade de países",
+            min_value=1,
+            max_value=len(agregados.codigos_paises),
+            value=N_PAISES_MAPA,
+            disabled=mapa_mundo
         )
 
-        if ano_selecionado != "Todos os anos":
-            ano_destaque = mortes_anuais[mortes_anuais['ano'] == ano_selecionado]
-            fig.add_trace(
-                go.Scatter(
-                    x=ano_destaque['ano'],
-                    y=ano_destaque['mortes'],
-                    mode='markers+text',
-                    marker=dict(size=13, color="#3867D6"),
-                    text=[f"{ano_destaque['mortes'].values[0] / 1e6:.1f}M"],
-                    textposition="top center",
-                    textfont=dict(size=12, color="#3867D6"),
-                    name=f"Destaque {ano_selecionado}"
-                )
-            )
+    # Taxas não somam anos nem causas: o mapa mostra um ano e uma causa.
+    with col3:
+        if taxa:
+            ano_mapa = st.selectbox("Ano do mapa", options=agregados.anos, index=len(agregados.anos) - 1)
         else:
-            fig.add_trace(
-                go.Scatter(
-                    x=mortes_anuais['ano'],
-                    y=mortes_anuais['mortes'],
-                    mode='markers+text',
-                    marker=dict(size=13, color="#3867D6"),
-                    text=mortes_anuais['mortes'].apply(lambda x: f"{x / 1e6:.1f}M"),
-                    textposition="top center",
-                    textfont=dict(size=12, color="#3867D6"),
-                    name="Tendência"
-                )
-            )     
-        
-        fig.update_layout(
-            xaxis=dict(showgrid=False),
-            yaxis=dict(showgrid=False, showticklabels=False),
-            legend_title=None,
-            showlegend=False,
-            plot_bgcolor="white"
-        )
+            ano_mapa = st.selectbox("Ano do mapa", options=["Todos os anos"] + agregados.anos)
 
-        st.plotly_chart(fig, use_container_width=True)
+    with col4:
+        if taxa:
+            causa_mapa = st.selectbox("Causa do mapa", options=agregados.causas,
+                                      index=agregados.causas.index(causa_taxa))
+        else:
+            causa_mapa = st.selectbox(
+                "Causa do mapa",
+                options=[None] + agregados.causas,
+                format_func=lambda causa: "Sem filtro" if causa is None else causa
+            )
 
-    elif btn == "Total de Mortes por Causa":
-        col1, col2 = st.columns([2, 3])
+    if mapa_mundo:
+        titulo_mapa.title("Valores por País" if taxa else "Mortes por País")
+    else:
+        titulo_mapa.title(f"{n_paises} Países com Maiores Valores" if taxa else f"{n_paises} Países com Mais Mortes")
 
-        # causas_traduzidas = ["Todas as causas"] + [traducao_causas.get(causa, causa) for causa in df['causa'].unique() if causa != "ALL CAUSES"]
+    with etapa('mapa_dados'):
+        top_paises_todas_mortes = agregados.ranking_paises(
+            None if mapa_mundo else n_paises,
+            ano=None if ano_mapa == "Todos os anos" else ano_mapa,
+            causa=causa_mapa
+        )
 
-        with col2:
-            # causa_traduzida_selecionada = st.selectbox("Selecione uma Causa", options=causas_traduzidas, index=0)
+    with etapa('mapa_geojson'):
+        caminho_geojson = aguardar(futuro_geojson, CAMINHO_GEOJSON) if url_geojson else CAMINHO_GEOJSON
 
-            causa_selec = st.selectbox("Selecione uma Causa", options=df['causa'].unique())
-        # causa_selecionada = {v: k for k, v in traducao_causas.items()}.get(causa_traduzida_selecionada, causa_traduzida_selecionada)
-        mortes_causa_selec = df[df['causa'] == causa_selec]['mortes'].sum()
+    with etapa('mapa_construcao'):
+        html_mapa = renderizar_mapa(top_paises_todas_mortes, mundo=mapa_mundo, caminho_geojson=caminho_geojson,
+                                    detalhes=True)
+    with etapa('mapa_envio'):
+        components.html(html_mapa, height=600)
 
 
-        with col1:
-            st.markdown("<div class='title-text'>Total de mortes</div>", unsafe_allow_html=True)
-            st.markdown(
-                f"<div class='total-mortes'><span class='highlight'>{mortes_causa_selec:,}</span>/{total_mortes:,}</div>",
-                unsafe_allow_html=True
-            )
+#=============================================================================================
+#País
 
-        colors = ['#EAEBF8' if causa != causa_selec else '#3867D6' for causa in df['causa']]
+def pais_da_url():
+    # ?pais=<código>, aberto pelo link "Ver detalhes" do popup do mapa.
+    codigo = st.query_params.get('pais')
+    for pais, codigo_pais in agregados.codigos_paises.items():
+        if codigo_pais == codigo:
+            return pais
+    return None
 
 
-        
+@secao('pais')
+def secao_pais(pais_inicial):
+    st.title("Detalhes por País")
 
-        # st.plotly_chart(fig, use_container_width=True)
-    
-        fig = go.Figure(data=[
-                go.Bar(
-                    x=df['causa'],
-                    y=df['mortes'],
-                    marker_color=colors,
-                    textposition="none",
-                    hoverinfo="x+y"
-                )
-            ])
-
-        fig.update_layout(
-            title="",
-            xaxis=dict(
-                tickangle=0,
-                tickmode="array",
-                tickvals=df['causa'],
-                ticktext=[f"<br>".join(causa.split()) for causa in df['causa']],
-            ),
-            yaxis=dict(
-                showticklabels=False,
-                showgrid=False
-            ),
-            font=dict(size=14, color="black"),
-            plot_bgcolor="rgba(0, 0, 0, 0)",
-            showlegend=False,
-            margin=dict(l=20, r=20, t=20, b=20),
-        )
+    col1, col2 = st.columns([2, 3])
 
-        fig.add_shape(
-            type="line",
-            x0=-0.5, x1=5.5,
-            y0=mortes_causa_selec, y1=mortes_causa_selec,
-            line=dict(color="#3867D6", width=2, dash="dash")
+    with col2:
+        # O selectbox aceita digitar para filtrar a lista de países.
+        pais_selecionado = st.selectbox(
+            "Selecione um País",
+            options=agregados.paises,
+            index=agregados.paises.index(pais_inicial)
         )
 
-        # fig.add_annotation(
-        #     x=len(mortes_por_continente.index) - 0.5,
-        #     y=mortes_continente_selec,
-        #     text=f"{formatar_numero(mortes_continente_selec)}",
-        #     showarrow=False,
-        #     font=dict(color="#3867D6", size=12),
-        #     align="right",
-        #     xanchor="left",
-        #     yanchor="middle"
-        # )
-
-        fig.add_annotation(
-            x=5.5,
-            y=mortes_causa_selec,
-            text=f"{formatar_numero(mortes_causa_selec)}",
-            showarrow=False,
-            font=dict(color="#3867D6", size=12),
-            align="right",
-            xanchor="left",
-            yanchor="middle"
-        )
+    with col1:
+        if taxa:
+            valor_pais = agregados.serie_pais(pais_selecionado).loc[ano_recente, causa_taxa]
+            st.markdown(f"<div class='title-text'>Valor em {ano_recente}</div>", unsafe_allow_html=True)
+            st.markdown(f"<div class='total-mortes'>{formatar_taxa(valor_pais)}</div>", unsafe_allow_html=True)
+        else:
+            mortes_pais = agregados.mortes_pais(pais_selecionado)
+            st.markdown("<div class='title-text'>Total de mortes</div>", unsafe_allow_html=True)
+            st.markdown(
+                f"<div class='total-mortes'><span class='highlight'>{mortes_pais:,}</span>/{total_mortes:,}</div>",
+                unsafe_allow_html=True
+            )
 
+    with etapa('figura'):
+        fig = grafico_pais(agregados, pais_selecionado)
+    with etapa('envio_grafico'):
         st.plotly_chart(fig, use_container_width=True)
 
-#=============================================================================================
-#Mapa
 
-st.title("10 Países com Mais Mortes")
-
-top_paises_todas_mortes = df.groupby('pais')['mortes'].sum().nlargest(10).reset_index()
-
-top_paises_todas_mortes["pais"] = top_paises_todas_mortes["pais"].replace({
-    "Russian Federation": "Russia"
-})
-
-translations = {
-    "China": "China",
-    "India": "India",
-    "Pakistan": "Paquistao",
-    "Russian Federation": "Russia",
-    "Indonesia": "Indonesia",
-    "Nigeria": "Nigeria",
-    "United States of America": "Estados Unidos",
-    "Bangladesh": "Bangladesh",
-    "Egypt": "Egito",
-    "Japan": "Japao"
-}
-
-coordinates = {
-    "China": [35.8617, 104.1954],
-    "India": [20.5937, 78.9629],
-    "Pakistan": [30.3753, 69.3451],
-    "Russia": [61.5240, 105.3188],
-    "Indonesia": [-0.7893, 113.9213],
-    "Nigeria": [9.0820, 8.6753],
-    "United States of America": [37.0902, -95.7129],
-    "Bangladesh": [23.6850, 90.3563],
-    "Egypt": [26.8206, 30.8025],
-    "Japan": [36.2048, 138.2529]
-}
-
-geojson_url = "https://raw.githubusercontent.com/johan/world.geo.json/master/countries.geo.json"
-response = requests.get(geojson_url)
-geojson_data = json.loads(response.text)
-
-m = folium.Map(location=[0, 0], zoom_start=1)
-
-
-folium.Choropleth(
-    geo_data=geojson_data,
-    name="choropleth",
-    data=top_paises_todas_mortes,
-    columns=["pais", "mortes"], 
-    key_on="feature.properties.name", 
-    fill_color="Blues",  
-    fill_opacity=0.5,
-    line_opacity=0.5,
-    legend_name="Valor (em milhões)",
-    highlight=True
-).add_to(m)
-
-for i, row in top_paises_todas_mortes.iterrows():
-    country = row["pais"]
-    mortes = row["mortes"]
-    
-  
-    translated_name = translations.get(country, country) 
-    
-    if country in coordinates:
-        lat, lon = coordinates[country]
-        popup_text = f"<b>Pais:</b> {translated_name}<br><b>Mortes:</b> {mortes:,}"
-        popup = Popup(popup_text, max_width=300)
-        folium.CircleMarker(
-            location=[lat, lon],
-            radius=2, 
-            color="red", 
-            fill=True,
-            fill_color="red",
-            fill_opacity=0.6,
-            popup=popup
-        ).add_to(m)
-
-
-map_file = "world_map.html"
-m.save(map_file)
-
-components.html(open(map_file, "r", encoding="utf-8").read(), height=600)
+# Vindo do mapa, o país escolhido aparece logo no topo.
+pais_url = pais_da_url()
+if pais_url:
+    secao_pais(pais_url)
+if taxa:
+    st.info("As views de totais somam os valores entre países e anos, o que só vale para contagens. "
+            "Para este indicador, use o mapa e os detalhes por país.")
+else:
+    secao_graficos()
+secao_mapa()
+if not pais_url:
+    secao_pais(pais_mais_mortes)
+
+with st.sidebar:
+    mostrar_tempos("Tempos da última execução da página", *finalizar_execucao())
@@ -0,0 +1,238 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from benchmarks.gerar_dados import gravar_dados
+from poluicao import agregados as modulo_agregados
+from poluicao import dados as modulo_dados
+from poluicao import graficos, mapa
+from poluicao.agregados import Agregados, agregar_csv, obter_agregados
+from poluicao.dados import caminho_parquet, carregar_dados
+from poluicao.formatacao import formatar_numero
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+
+# Cada caso devolve (preparar, medir): preparar roda antes de cada
+# repetição e fica fora da medição.
+CASOS = []
+
+
+def caso(nome, repeticoes=None):
+    def registrar(funcao):
+        CASOS.append((nome, repeticoes, funcao))
+        return funcao
+    return registrar
+
+
+def _nada():
+    pass
+
+
+def _limpar_caches():
+    modulo_dados.limpar_cache()
+    modulo_agregados.limpar_cache()
+    graficos.limpar_cache()
+    mapa.limpar_cache()
+
+
+@caso('carga/fria', repeticoes=3)
+def _carga_fria(contexto):
+    def preparar():
+        _limpar_caches()
+        if os.path.exists(caminho_parquet(contexto['csv'])):
+            os.remove(caminho_parquet(contexto['csv']))
+
+    return preparar, lambda: obter_agregados(carregar_dados(contexto['csv']))
+
+
+@caso('carga/parquet')
+def _carga_parquet(contexto):
+    return _limpar_caches, lambda: obter_agregados(carregar_dados(contexto['csv']))
+
+
+@caso('carga/rerun')
+def _carga_rerun(contexto):
+    return _nada, lambda: obter_agregados(carregar_dados(contexto['csv']))
+
+
+@caso('carga/streaming', repeticoes=3)
+def _carga_streaming(contexto):
+    return _nada, lambda: agregar_csv(contexto['csv'])
+
+
+@caso('agregados/cubo')
+def _cubo(contexto):
+    return _nada, lambda: Agregados(contexto['df'])
+
+
+VIEWS = {
+    'total_continente': (graficos.grafico_total_continente, lambda ag: ag.continentes[0]),
+    'tendencia_continente': (graficos.grafico_tendencia_continente, lambda ag: ag.continentes[0]),
+    'causa_anos': (graficos.grafico_causa_anos, lambda ag: ag.causas[0]),
+    'tendencia_ano': (graficos.grafico_tendencia_ano, lambda ag: None),
+    'total_causa': (graficos.grafico_total_causa, lambda ag: ag.causas[0]),
+    'pais': (graficos.grafico_pais, lambda ag: ag.pais_mais_mortes),
+}
+
+
+def _registrar_view(nome, grafico, selecao):
+    @caso(f'view/{nome}/fria')
+    def _fria(contexto):
+        # Agregados novo: inclui os rollups da view e a construção da figura.
+        estado = {}
+
+        def preparar():
+            graficos.limpar_cache()
+            estado['agregados'] = Agregados(contexto['df'])
+
+        return preparar, lambda: grafico(estado['agregados'], selecao(estado['agregados']))
+
+    @caso(f'view/{nome}/quente')
+    def _quente(contexto):
+        agregados = contexto['agregados']
+        grafico(agregados, selecao(agregados))
+        return _nada, lambda: grafico(agregados, selecao(agregados))
+
+    @caso(f'view/{nome}/serializacao')
+    def _serializacao(contexto):
+        agregados = contexto['agregados']
+        fig = grafico(agregados, selecao(agregados))
+        return _nada, fig.to_json
+
+
+for _nome, (_grafico, _selecao) in VIEWS.items():
+    _registrar_view(_nome, _grafico, _selecao)
+
+
+@caso('formatacao/rotulos')
+def _formatacao(contexto):
+    # Um rótulo por linha do frame limpo: o pior caso das séries por país.
+    mortes = contexto['df']['mortes']
+    return _nada, lambda: formatar_numero(mortes)
+
+
+@caso('mapa/top10')
+def _mapa_top10(contexto):
+    top = contexto['agregados'].top_paises(10)
+    return mapa.limpar_cache, lambda: mapa.renderizar_mapa(top)
+
+
+@caso('mapa/mundo')
+def _mapa_mundo(contexto):
+    todos = contexto['agregados'].ranking_paises()
+    return mapa.limpar_cache, lambda: mapa.renderizar_mapa(todos, mundo=True)
+
+
+@caso('mapa/cache')
+def _mapa_cache(contexto):
+    top = contexto['agregados'].top_paises(10)
+    mapa.renderizar_mapa(top)
+    return _nada, lambda: mapa.renderizar_mapa(top)
+
+
+def medir(preparar, funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        preparar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return {
+        'min': min(tempos),
+        'mediana': statistics.median(tempos),
+        'media': statistics.fmean(tempos),
+        'repeticoes': repeticoes,
+    }
+
+
+def executar(csv, repeticoes=5, filtro=None):
+    _limpar_caches()
+    df = carregar_dados(csv)
+    contexto = {'csv': csv, 'df': df, 'agregados': obter_agregados(df)}
+
+    resultados = {}
+    for nome, repeticoes_caso, criar in CASOS:
+        if filtro and filtro not in nome:
+            continue
+        preparar, funcao = criar(contexto)
+        resultados[nome] = medir(preparar, funcao, repeticoes_caso or repeticoes)
+        print(f"{nome:40s} {resultados[nome]['mediana'] * 1000:10.3f} ms", flush=True)
+        # Casos que limpam os caches não podem deixar o contexto sem frame.
+        contexto['df'] = carregar_dados(csv)
+        contexto['agregados'] = obter_agregados(contexto['df'])
+
+    return {
+        'meta': {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'csv': os.path.abspath(csv),
+            'linhas_csv': sum(1 for _ in open(csv, encoding='utf-8')) - 1,
+            'linhas_limpas': len(contexto['df']),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+        },
+        'resultados': resultados,
+    }
+
+
+def comparar(atual, base, limite):
+    regressoes = []
+    print(f"\n{'caso':40s} {'base (ms)':>12s} {'atual (ms)':>12s} {'razão':>8s}")
+    for nome, resultado in atual['resultados'].items():
+        anterior = base['resultados'].get(nome)
+        if anterior is None:
+            continue
+        razao = resultado['mediana'] / anterior['mediana'] if anterior['mediana'] else float('inf')
+        marca = ' <-- regressão' if razao > limite else ''
+        print(f"{nome:40s} {anterior['mediana'] * 1000:12.3f} {resultado['mediana'] * 1000:12.3f} {razao:8.2f}{marca}")
+        if marca:
+            regressoes.append(nome)
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Mede carga, agregação, figuras e mapa do painel.')
+    parser.add_argument('--dados', help='CSV a usar; por padrão gera um sintético')
+    parser.add_argument('--fator', type=int, default=1, help='escala do CSV sintético (1, 10, 100...)')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--filtro', help='só roda os casos cujo nome contém este texto')
+    parser.add_argument('--saida', help='arquivo JSON de resultados')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior para comparar')
+    parser.add_argument('--limite', type=float, default=1.25,
+                        help='razão atual/base acima da qual um caso conta como regressão')
+    args = parser.parse_args()
+
+    csv = args.dados
+    if csv is None:
+        csv = os.path.join(PASTA, 'dados', f'x{args.fator}', 'data.csv')
+        if not os.path.exists(csv):
+            print(f'gerando {csv}...', flush=True)
+            gravar_dados(csv, args.fator)
+
+    resultado = executar(csv, args.repeticoes, args.filtro)
+    resultado['meta']['fator'] = args.fator if args.dados is None else None
+
+    saida = args.saida or os.path.join(
+        PASTA, 'resultados', f"{datetime.now():%Y%m%d-%H%M%S}-x{args.fator}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, indent=2)
+    print(f'\nresultados em {saida}')
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            base = json.load(arquivo)
+        if comparar(resultado, base, args.limite):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from poluicao.geo import CAMINHO_GEOJSON
+
+COLUNAS_OMS = ['IndicatorCode', 'Indicator', 'ValueType', 'ParentLocationCode', 'ParentLocation',
+               'Location type', 'SpatialDimValueCode', 'Location', 'Period type', 'Period',
+               'IsLatestYear', 'Dim1 type', 'Dim1', 'Dim1ValueCode', 'Dim2 type', 'Dim2',
+               'Dim2ValueCode', 'Dim3 type', 'Dim3', 'Dim3ValueCode', 'DataSourceDimValueCode',
+               'DataSource', 'FactValueNumericPrefix', 'FactValueNumeric', 'FactValueUoM',
+               'FactValueNumericLowPrefix', 'FactValueNumericLow', 'FactValueNumericHighPrefix',
+               'FactValueNumericHigh', 'Value', 'FactValueTranslationID', 'FactComments',
+               'Language', 'DateModified']
+
+REGIOES = [('AFR', 'Africa'), ('AMR', 'Americas'), ('EMR', 'Eastern Mediterranean'),
+           ('EUR', 'Europe'), ('SEAR', 'South-East Asia'), ('WPR', 'Western Pacific')]
+
+SEXOS = [('Both sexes', 'SEX_BTSX'), ('Male', 'SEX_MLE'), ('Female', 'SEX_FMLE')]
+
+CAUSAS = [('ALL CAUSES', 'GHECAUSES_ALL'),
+          ('Trachea, bronchus, lung cancers', 'GHE_LUNG'),
+          ('Chronic obstructive pulmonary disease', 'GHE_COPD'),
+          ('Acute lower respiratory infections', 'GHE_LRI'),
+          ('Stroke', 'GHE_STROKE'),
+          ('Ischaemic heart disease', 'GHE_IHD')]
+
+ANOS = range(2010, 2020)
+
+
+def _paises(fator):
+    # Os países reais do GeoJSON, repetidos com sufixo para as escalas
+    # maiores; as cópias não têm geometria, como um país sem fronteira
+    # no arquivo.
+    with open(CAMINHO_GEOJSON, encoding='utf-8') as arquivo:
+        features = json.load(arquivo)['features']
+    paises = []
+    for copia in range(fator):
+        for i, feature in enumerate(features):
+            codigo, nome = feature['id'], feature['properties']['name']
+            if copia:
+                codigo, nome = f'{codigo}{copia}', f'{nome} {copia}'
+            paises.append((REGIOES[i % len(REGIOES)], codigo, nome))
+    return paises
+
+
+def gerar_dados(fator=1, semente=0):
+    paises = _paises(fator)
+    n_paises, n_anos, n_sexos, n_causas = len(paises), len(ANOS), len(SEXOS), len(CAUSAS)
+    linhas = n_paises * n_anos * n_sexos * n_causas
+
+    i_pais = np.repeat(np.arange(n_paises), n_anos * n_sexos * n_causas)
+    i_ano = np.tile(np.repeat(np.arange(n_anos), n_sexos * n_causas), n_paises)
+    i_sexo = np.tile(np.repeat(np.arange(n_sexos), n_causas), n_paises * n_anos)
+    i_causa = np.tile(np.arange(n_causas), n_paises * n_anos * n_sexos)
+
+    def coluna(valores, indices):
+        return np.asarray(valores, dtype=object)[indices]
+
+    rng = np.random.default_rng(semente)
+    valores = rng.gamma(0.6, 20_000, size=linhas).round(2)
+
+    df = pd.DataFrame({nome: '' for nome in COLUNAS_OMS}, index=range(linhas))
+    df['IndicatorCode'] = 'AIR_41'
+    df['Indicator'] = 'Joint effects of air pollution attributable deaths'
+    df['ValueType'] = 'numeric'
+    df['ParentLocationCode'] = coluna([p[0][0] for p in paises], i_pais)
+    df['ParentLocation'] = coluna([p[0][1] for p in paises], i_pais)
+    df['Location type'] = 'Country'
+    df['SpatialDimValueCode'] = coluna([p[1] for p in paises], i_pais)
+    df['Location'] = coluna([p[2] for p in paises], i_pais)
+    df['Period type'] = 'Year'
+    df['Period'] = np.asarray(ANOS)[i_ano]
+    df['IsLatestYear'] = np.where(np.asarray(ANOS)[i_ano] == ANOS[-1], 'true', 'false')
+    df['Dim1 type'] = 'Sex'
+    df['Dim1'] = coluna([s[0] for s in SEXOS], i_sexo)
+    df['Dim1ValueCode'] = coluna([s[1] for s in SEXOS], i_sexo)
+    df['Dim2 type'] = 'Cause'
+    df['Dim2'] = coluna([c[0] for c in CAUSAS], i_causa)
+    df['Dim2ValueCode'] = coluna([c[1] for c in CAUSAS], i_causa)
+    df['FactValueNumeric'] = valores
+    df['Value'] = valores.round().astype(np.int64).astype(str)
+    df['Language'] = 'EN'
+    df['DateModified'] = '2022-08-12T12:00:00.000Z'
+    return df
+
+
+def gravar_dados(destino, fator=1, semente=0):
+    pasta = os.path.dirname(destino)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    gerar_dados(fator, semente).to_csv(destino, index=False)
+    return destino
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera um CSV sintético no formato da exportação da OMS.')
+    parser.add_argument('-o', '--destino', default='data.csv')
+    parser.add_argument('--fator', type=int, default=1, help='multiplica o número de países')
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args()
+    print(gravar_dados(args.destino, args.fator, args.semente))
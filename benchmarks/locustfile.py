@@ -0,0 +1,85 @@
+import random
+import time
+import urllib.parse
+
+import websocket
+from locust import User, between, events, task
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+# Teste de carga do painel: cada usuário abre uma sessão do Streamlit (o
+# websocket /_stcore/stream, o mesmo do navegador) e pede reruns do script,
+# medidos do envio até o script_finished. Uso:
+#
+#   pip install locust websocket-client
+#   locust -f benchmarks/locustfile.py --host http://127.0.0.1:8501 \
+#       --headless -u 20 -r 5 -t 1m
+#
+# contra `streamlit run app.py` e contra `python -m poluicao servir`.
+
+# Códigos usados no rerun do detalhamento (?pais=...).
+PAISES = ['IND', 'CHN', 'NGA', 'BRA', 'USA', 'IDN', 'PAK', 'RUS', 'BGD', 'EGY']
+
+# Limite por rerun; acima disso a sessão é considerada travada.
+ESPERA_RERUN = 60
+
+
+@events.init_command_line_parser.add_listener
+def _opcoes(parser):
+    parser.add_argument('--paises', default=','.join(PAISES), help='códigos ISO3 para os reruns com ?pais=')
+
+
+class SessaoPainel(User):
+    wait_time = between(1, 3)
+
+    def on_start(self):
+        url = urllib.parse.urlsplit(self.host)
+        esquema = 'wss' if url.scheme == 'https' else 'ws'
+        self.paises = self.environment.parsed_options.paises.split(',')
+        self.ws = websocket.create_connection(
+            f'{esquema}://{url.netloc}{url.path.rstrip("/")}/_stcore/stream',
+            subprotocols=['streamlit'],
+            timeout=ESPERA_RERUN,
+        )
+        # A primeira execução é a que o navegador faz ao abrir a página.
+        self._rerun('abrir')
+
+    def on_stop(self):
+        self.ws.close()
+
+    def _rerun(self, nome, query_string=''):
+        mensagem = BackMsg()
+        mensagem.rerun_script.query_string = query_string
+        inicio = time.perf_counter()
+        tamanho = 0
+        erro = None
+        try:
+            self.ws.send_binary(mensagem.SerializeToString())
+            while True:
+                quadro = self.ws.recv()
+                tamanho += len(quadro)
+                resposta = ForwardMsg.FromString(quadro)
+                if resposta.WhichOneof('type') == 'script_finished':
+                    # 0 é FINISHED_SUCCESSFULLY; os outros são exceção no
+                    # script ou rerun interrompido.
+                    if resposta.script_finished != ForwardMsg.FINISHED_SUCCESSFULLY:
+                        erro = RuntimeError(f'script_finished={resposta.script_finished}')
+                    break
+        except (websocket.WebSocketException, OSError) as falha:
+            erro = falha
+        self.environment.events.request.fire(
+            request_type='WS',
+            name=nome,
+            response_time=(time.perf_counter() - inicio) * 1000,
+            response_length=tamanho,
+            exception=erro,
+            context={},
+        )
+
+    @task(4)
+    def pagina(self):
+        self._rerun('rerun')
+
+    @task(1)
+    def pais(self):
+        self._rerun('rerun ?pais', f'pais={random.choice(self.paises)}')
@@ -0,0 +1,22 @@
+from poluicao.agregados import CAUSA_TOTAL, Agregados, agregar_csv, obter_agregados
+from poluicao.atualizacao import atualizar
+from poluicao.banco import AgregadosSQL, obter_agregados_sql
+from poluicao.compartilhado import carregar_compartilhado, obter_agregados_compartilhados
+from poluicao.consultas import (
+    mortes,
+    mortes_por_ano,
+    mortes_por_causa,
+    mortes_por_continente,
+    mortes_por_pais,
+)
+from poluicao.dados import (
+    carregar_dados,
+    converter_csv,
+    limpar_dados,
+    renomear_continentes,
+    traducao_causas,
+)
+from poluicao.formatacao import formatar_em_milhoes, formatar_numero, formatar_taxa
+from poluicao.geo import carregar_geojson, centroides, geometrias, versao_geojson
+from poluicao.ingestao import carregar_indicador, indicadores, ingerir, unidade
+from poluicao.remoto import buscar, buscar_em_segundo_plano
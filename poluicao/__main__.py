@@ -0,0 +1,78 @@
+import argparse
+import logging
+import os
+
+from poluicao.agregados import obter_agregados
+from poluicao.atualizacao import INDICADOR_PADRAO, URL_GHO, atualizar
+from poluicao.dados import TAMANHO_BLOCO, carregar_dados, converter_csv
+from poluicao.geo import URL_GEOJSON, atualizar_geojson
+from poluicao.ingestao import LOJA_PADRAO, ingerir
+from poluicao.servico import PORTA, PORTA_PROCESSOS, servir
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m poluicao')
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    converter = comandos.add_parser('converter', help='gera o parquet limpo a partir do CSV da OMS')
+    converter.add_argument('csv', nargs='?', default='data.csv')
+    converter.add_argument('-o', '--destino')
+    converter.add_argument('--bloco', type=int, default=TAMANHO_BLOCO, help='linhas lidas por vez')
+
+    geo = comandos.add_parser('geo-atualizar', help='baixa novamente as fronteiras dos países usadas no mapa')
+    geo.add_argument('--url', default=URL_GEOJSON)
+    geo.add_argument('-o', '--destino')
+
+    ingestao = comandos.add_parser('ingerir', help='distribui exportações da OMS pela loja de indicadores')
+    ingestao.add_argument('csv', nargs='+')
+    ingestao.add_argument('-o', '--loja', default=LOJA_PADRAO)
+    ingestao.add_argument('--bloco', type=int, default=TAMANHO_BLOCO, help='linhas lidas por vez')
+    ingestao.add_argument('--taxa', action='append', default=[], metavar='CODIGO',
+                          help='marca o indicador como taxa mesmo que o nome não diga')
+
+    atualizacao = comandos.add_parser('atualizar',
+                                      help='traz da API da OMS só as linhas modificadas desde a última vez')
+    atualizacao.add_argument('csv', nargs='?', default='data.csv')
+    atualizacao.add_argument('--indicador', default=INDICADOR_PADRAO)
+    atualizacao.add_argument('--url', default=URL_GHO)
+
+    estatico = comandos.add_parser('exportar-estatico',
+                                   help='pré-renderiza todas as views e mapas num site estático')
+    estatico.add_argument('csv', nargs='?', default='data.csv')
+    estatico.add_argument('-o', '--destino', default='site')
+
+    servico = comandos.add_parser('servir', help='sobe vários processos aquecidos do app atrás de um proxy local')
+    servico.add_argument('app', nargs='?', default='app.py')
+    servico.add_argument('-n', '--processos', type=int, default=os.cpu_count() or 2)
+    servico.add_argument('--porta', type=int, default=PORTA)
+    servico.add_argument('--endereco', default='0.0.0.0')
+    servico.add_argument('--porta-processos', type=int, default=PORTA_PROCESSOS,
+                         help='primeira porta interna dos processos')
+
+    args = parser.parse_args()
+    if args.comando == 'converter':
+        print(converter_csv(args.csv, args.destino, args.bloco))
+    elif args.comando == 'geo-atualizar':
+        print(atualizar_geojson(args.url, args.destino))
+    elif args.comando == 'atualizar':
+        resumo = atualizar(args.csv, args.indicador, args.url)
+        print(f"{resumo['atualizadas']} linhas atualizadas, {resumo['novas']} novas "
+              f"(sincronizado até {resumo['sincronizado_ate']})")
+        for chave in ('paises', 'anos', 'causas'):
+            if resumo[chave]:
+                print(f"{chave}: {', '.join(map(str, resumo[chave]))}")
+    elif args.comando == 'exportar-estatico':
+        # Importado só aqui: gráficos e mapa puxam plotly e folium, que os
+        # outros comandos não precisam.
+        from poluicao.estatico import exportar_estatico
+        print(exportar_estatico(obter_agregados(carregar_dados(args.csv)), args.destino))
+    elif args.comando == 'servir':
+        logging.basicConfig(level=logging.INFO)
+        servir(args.app, args.processos, args.porta, args.endereco, args.porta_processos)
+    elif args.comando == 'ingerir':
+        for codigo, info in ingerir(args.csv, args.loja, args.bloco, args.taxa).items():
+            print(f"{codigo}: {info['linhas']} linhas, {info['unidade']} ({info['nome']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+import functools
+import threading
+
+import numpy as np
+import pandas as pd
+
+from poluicao.dados import ANO_INICIAL, TAMANHO_BLOCO, ler_blocos
+from poluicao.ingestao import MAX_INDICADORES_EM_CACHE
+
+CAUSA_TOTAL = 'Todas as causas'
+
+CHAVES_CUBO = ['continente', 'pais', 'ano', 'causa']
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _sem_categorias(serie):
+    # Os rollups são pequenos; índices simples evitam que o plotly e os
+    # selectboxes recebam CategoricalIndex.
+    serie = serie.copy()
+    if serie.index.nlevels == 1:
+        serie.index = serie.index.astype(object)
+    else:
+        serie.index = serie.index.set_levels([nivel.astype(object) for nivel in serie.index.levels])
+    return serie
+
+
+def _valores(mortes):
+    # Contagens somam em int64; taxas (indicadores da loja) ficam em float.
+    return mortes.astype('int64' if pd.api.types.is_integer_dtype(mortes) else 'float64')
+
+
+def limpar_cache():
+    with _lock:
+        _cache.clear()
+
+
+class Agregados:
+    # O cubo e os números dos cartões do topo são calculados na carga; os
+    # rollups de cada view só na primeira vez em que a view é exibida.
+    def __init__(self, df):
+        mortes = _valores(df['mortes'])
+        cubo = mortes.groupby([df[chave] for chave in CHAVES_CUBO], observed=True).sum()
+        codigos = df[['pais', 'pais_code']].drop_duplicates('pais')
+        self._montar(
+            cubo,
+            dict(zip(codigos['pais'].astype(str), codigos['pais_code'].astype(str))),
+            [str(c) for c in df['continente'].unique()],
+            [str(c) for c in df['causa'].unique()],
+        )
+
+    @classmethod
+    def do_cubo(cls, cubo, codigos_paises, continentes, causas):
+        # Para quando o cubo já foi somado por fora (ver agregar_csv), sem
+        # o frame linha a linha.
+        agregados = cls.__new__(cls)
+        agregados._montar(cubo, codigos_paises, continentes, causas)
+        return agregados
+
+    def _montar(self, cubo, codigos_paises, continentes, causas):
+        self.cubo = cubo
+        # False para taxas: os valores não são somáveis entre países e anos,
+        # e o app troca os cartões de totais (ver app.py).
+        self.contagem = pd.api.types.is_integer_dtype(cubo)
+        self.total_mortes = self._numero(self._todas.sum())
+
+        # Os cartões do topo somam todas as linhas, inclusive "Todas as causas".
+        self.por_pais = _sem_categorias(cubo.groupby(level='pais', observed=True).sum())
+        self.por_continente_geral = _sem_categorias(cubo.groupby(level='continente', observed=True).sum())
+        self.por_ano_geral = _sem_categorias(cubo.groupby(level='ano').sum())
+
+        self.continente_mais_mortes = self.por_continente_geral.idxmax()
+        self.pais_mais_mortes = self.por_pais.idxmax()
+        self.mortes_pais_mais_mortes = self._numero(self.por_pais.max())
+
+        self._rankings = {}
+        self.codigos_paises = codigos_paises
+
+        self.continentes = continentes
+        self.causas = causas
+        self.anos = [int(a) for a in self.por_ano_geral.index]
+
+    def _numero(self, valor):
+        return int(valor) if self.contagem else float(valor)
+
+    @functools.cached_property
+    def tem_total(self):
+        return CAUSA_TOTAL in self.cubo.index.get_level_values('causa')
+
+    @functools.cached_property
+    def _todas(self):
+        # Indicadores sem a linha "Todas as causas" usam a soma das causas.
+        if self.tem_total:
+            return self.cubo.xs(CAUSA_TOTAL, level='causa')
+        return self.cubo.groupby(level=['continente', 'pais', 'ano'], observed=True).sum()
+
+    @functools.cached_property
+    def por_continente(self):
+        return _sem_categorias(self._todas.groupby(level='continente', observed=True).sum())
+
+    @functools.cached_property
+    def por_continente_ano(self):
+        return _sem_categorias(self._todas.groupby(level=['continente', 'ano'], observed=True).sum())
+
+    @functools.cached_property
+    def por_ano(self):
+        return _sem_categorias(self._todas.groupby(level='ano').sum())
+
+    @functools.cached_property
+    def por_causa(self):
+        return _sem_categorias(self.cubo.groupby(level='causa', observed=True).sum())
+
+    @functools.cached_property
+    def por_causa_ano(self):
+        return _sem_categorias(self.cubo.groupby(level=['causa', 'ano'], observed=True).sum())
+
+    @functools.cached_property
+    def por_pais_ano_causa(self):
+        return _sem_categorias(
+            self.cubo.groupby(level=['pais', 'ano', 'causa'], observed=True).sum()
+        ).sort_index()
+
+    @functools.cached_property
+    def paises(self):
+        return sorted(self.codigos_paises)
+
+    @functools.cached_property
+    def _indice_paises(self):
+        # Uma matriz causa x ano por país, todas num único array preenchido
+        # de uma vez: consultar um país é um acesso ao dicionário mais uma
+        # fatia, com o mesmo custo quantos forem os países e os anos.
+        serie = self.cubo.groupby(level=['pais', 'causa', 'ano'], observed=True).sum()
+        paises = pd.Index(self.paises)
+        causas = pd.Index(self.causas)
+        anos = pd.Index(self.anos)
+        matriz = np.zeros((len(paises), len(causas), len(anos)), dtype=self.cubo.dtype)
+        matriz[
+            paises.get_indexer(serie.index.get_level_values('pais').astype(object)),
+            causas.get_indexer(serie.index.get_level_values('causa').astype(object)),
+            anos.get_indexer(serie.index.get_level_values('ano').astype('int64')),
+        ] = serie.to_numpy()
+        posicoes = {pais: posicao for posicao, pais in enumerate(paises)}
+        return posicoes, matriz
+
+    def serie_pais(self, pais):
+        # Mortes do país por ano (linhas) e causa (colunas).
+        posicoes, matriz = self._indice_paises
+        return pd.DataFrame(
+            matriz[posicoes[pais]].T,
+            index=pd.Index(self.anos, name='ano'),
+            columns=pd.Index(self.causas, name='causa'),
+        )
+
+    def mortes_pais(self, pais, causa=CAUSA_TOTAL):
+        posicoes, matriz = self._indice_paises
+        if causa == CAUSA_TOTAL and not self.tem_total:
+            return self._numero(matriz[posicoes[pais]].sum())
+        return self._numero(matriz[posicoes[pais], self.causas.index(causa)].sum())
+
+    def mortes_continente(self, continente):
+        return self._numero(self.por_continente.get(continente, 0))
+
+    def mortes_causa(self, causa):
+        return self._numero(self.por_causa.get(causa, 0))
+
+    def mortes_ano(self, ano, causa=CAUSA_TOTAL):
+        if causa == CAUSA_TOTAL:
+            return self._numero(self.por_ano.get(ano, 0))
+        return self._numero(self.por_causa_ano.get((causa, ano), 0))
+
+    def mortes_ano_geral(self, ano):
+        return self._numero(self.por_ano_geral.get(ano, 0))
+
+    def serie_continente(self, continente):
+        return self.por_continente_ano.loc[continente]
+
+    def serie_causa(self, causa):
+        return self.por_causa_ano.loc[causa]
+
+    def ranking_paises(self, n=None, ano=None, causa=None):
+        # Sem ano nem causa o ranking soma todas as linhas, como o cartão
+        # "País com mais mortes".
+        chave = (n, ano, causa)
+        ranking = self._rankings.get(chave)
+        if ranking is not None:
+            return ranking
+
+        if ano is None and causa is None:
+            por_pais = self.por_pais
+        else:
+            serie = self.por_pais_ano_causa
+            if ano is not None:
+                serie = serie.xs(ano, level='ano', drop_level=False)
+            if causa is not None:
+                serie = serie.xs(causa, level='causa', drop_level=False)
+            por_pais = serie.groupby(level='pais').sum()
+
+        # O índice vem em ordem alfabética; a ordenação estável desempata
+        # pelo nome do país, como o ORDER BY dos backends SQL.
+        top = por_pais.nlargest(n) if n else por_pais.sort_values(ascending=False, kind='stable')
+        ranking = pd.DataFrame({
+            'pais': top.index,
+            'pais_code': [self.codigos_paises[pais] for pais in top.index],
+            'mortes': top.values,
+        })
+        self._rankings[chave] = ranking
+        return ranking
+
+    def top_paises(self, n=10):
+        return self.ranking_paises(n)
+
+
+def agregar_csv(caminho_csv, tamanho_bloco=TAMANHO_BLOCO):
+    # Soma o cubo bloco a bloco direto do CSV da OMS, sem montar o frame
+    # limpo inteiro: a memória fica limitada ao bloco mais o cubo, cujo
+    # tamanho depende de países x anos x causas, não do número de linhas.
+    parciais = []
+    linhas_parciais = 0
+    limite = tamanho_bloco
+    codigos_paises = {}
+    continentes = {}
+    causas = {}
+    for bloco in ler_blocos(caminho_csv, tamanho_bloco):
+        mortes = bloco['mortes'].astype('int64')
+        parciais.append(mortes.groupby([bloco[chave] for chave in CHAVES_CUBO], observed=True).sum())
+        linhas_parciais += len(parciais[-1])
+        # Junta as somas parciais quando passam do limite; o limite
+        # acompanha o cubo para não refazer a soma inteira a cada bloco.
+        if linhas_parciais > limite:
+            parciais = [pd.concat(parciais).groupby(level=CHAVES_CUBO).sum()]
+            linhas_parciais = len(parciais[0])
+            limite = max(tamanho_bloco, linhas_parciais) + linhas_parciais
+
+        codigos = bloco[['pais', 'pais_code']].drop_duplicates('pais')
+        for pais, codigo in zip(codigos['pais'].astype(str), codigos['pais_code'].astype(str)):
+            codigos_paises.setdefault(pais, codigo)
+        # Dicionários como conjuntos ordenados: a ordem de aparição é a dos
+        # selectboxes, igual a df[...].unique() no caminho em memória.
+        continentes.update(dict.fromkeys(str(c) for c in bloco['continente'].unique()))
+        causas.update(dict.fromkeys(str(c) for c in bloco['causa'].unique()))
+
+    cubo = pd.concat(parciais).groupby(level=CHAVES_CUBO).sum() if parciais else None
+    if cubo is None or cubo.empty:
+        raise ValueError(f'{caminho_csv} não tem linhas a partir de {ANO_INICIAL}')
+    return Agregados.do_cubo(cubo, codigos_paises, list(continentes), list(causas))
+
+
+def obter_agregados(df):
+    # Um Agregados por frame vivo: o de carregar_dados e os dos indicadores
+    # que carregar_indicador mantém na memória, com o mesmo limite; assim
+    # trocar de indicador não refaz o cubo nem descarta os gráficos já
+    # montados. Guardar o próprio frame impede que outro objeto reaproveite
+    # o mesmo id.
+    with _lock:
+        em_cache = _cache.get(id(df))
+        if em_cache is not None and em_cache[0] is df:
+            return em_cache[1]
+
+        agregados = Agregados(df)
+        _cache.pop(id(df), None)
+        while len(_cache) >= MAX_INDICADORES_EM_CACHE:
+            del _cache[next(iter(_cache))]
+        _cache[id(df)] = (df, agregados)
+        return agregados
@@ -0,0 +1,34 @@
+import contextlib
+import os
+import threading
+
+
+def assinatura(caminho):
+    # (mtime_ns, tamanho) de um arquivo de origem: os caches e os arquivos
+    # derivados guardam este par e são refeitos quando ele muda, mesmo que
+    # a cópia nova tenha data mais antiga.
+    info = os.stat(caminho)
+    return info.st_mtime_ns, info.st_size
+
+
+@contextlib.contextmanager
+def escrita_atomica(destino):
+    # Devolve um caminho temporário ao lado de destino e, se o bloco
+    # terminar sem erro, troca o destino por ele de uma vez: outros
+    # processos nunca leem o arquivo pela metade. Com erro, o temporário é
+    # apagado e o destino fica como estava.
+    temporario = f'{destino}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        yield temporario
+        os.replace(temporario, destino)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+def gravar_atomico(destino, conteudo, modo='wb'):
+    os.makedirs(os.path.dirname(destino) or '.', exist_ok=True)
+    with escrita_atomica(destino) as temporario:
+        with open(temporario, modo, **({} if 'b' in modo else {'encoding': 'utf-8'})) as arquivo:
+            arquivo.write(conteudo)
+    return destino
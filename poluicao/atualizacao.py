@@ -0,0 +1,241 @@
+import json
+import os
+from urllib.parse import quote
+
+import pandas as pd
+
+from poluicao import arquivos, remoto
+from poluicao.dados import (
+    COLUNAS,
+    COLUNAS_CATEGORICAS,
+    COLUNAS_ORIGEM,
+    TAMANHO_BLOCO,
+    TIPOS_ORIGEM,
+    _desatualizado,
+    _traduzir,
+    caminho_parquet,
+    gravar_parquet,
+    limpar_dados,
+    ler_parquet,
+)
+
+URL_GHO = 'https://ghoapi.azureedge.net/api'
+
+INDICADOR_PADRAO = 'AIR_41'
+
+# Identifica uma linha da exportação; a mesma combinação vinda da API
+# substitui a linha antiga.
+CHAVE_ORIGEM = ['IndicatorCode', 'SpatialDimValueCode', 'Period', 'Dim1ValueCode', 'Dim2ValueCode']
+
+# A mesma chave depois de limpar_dados (que só deixa ambos os sexos).
+CHAVE_LIMPA = ['pais_code', 'ano', 'causa_code']
+
+# Rótulos das colunas "... type" da exportação para os tipos de dimensão da API.
+TIPOS_DIMENSAO = {'COUNTRY': 'Country', 'YEAR': 'Year', 'SEX': 'Sex', 'GHECAUSES': 'Cause'}
+
+
+def caminho_estado(caminho_csv):
+    return os.path.splitext(caminho_csv)[0] + '.sync.json'
+
+
+def _data(texto):
+    data = pd.Timestamp(texto)
+    return data.tz_localize('UTC') if data.tzinfo is None else data.tz_convert('UTC')
+
+
+def _formatar_data(data):
+    # Mesmo formato da coluna DateModified da exportação.
+    return f'{data:%Y-%m-%dT%H:%M:%S}.{data.microsecond // 1000:03d}Z'
+
+
+def _ler_estado(caminho_csv):
+    try:
+        with open(caminho_estado(caminho_csv), encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except FileNotFoundError:
+        return {}
+
+
+def _gravar_estado(caminho_csv, estado):
+    arquivos.gravar_atomico(caminho_estado(caminho_csv), json.dumps(estado, indent=2), modo='w')
+
+
+def _examinar_csv(caminho_csv, tamanho_bloco):
+    # Uma passada pelo CSV para saber a última modificação já presente e os
+    # rótulos (nomes de países, causas...) que a API não devolve.
+    colunas = ['IndicatorCode', 'Indicator', 'SpatialDimValueCode', 'Location', 'Dim1 type', 'Dim1',
+               'Dim1ValueCode', 'Dim2 type', 'Dim2', 'Dim2ValueCode', 'DateModified']
+    rotulos = {'Indicator': {}, 'Location': {}, 'Dim1': {}, 'Dim2': {}}
+    ultima = None
+    leitor = pd.read_csv(caminho_csv, usecols=colunas, dtype=str, keep_default_na=False, chunksize=tamanho_bloco)
+    with leitor:
+        for bloco in leitor:
+            for codigo, rotulo in (('IndicatorCode', 'Indicator'), ('SpatialDimValueCode', 'Location'),
+                                   ('Dim1ValueCode', 'Dim1'), ('Dim2ValueCode', 'Dim2')):
+                pares = bloco[[codigo, rotulo]].drop_duplicates(codigo)
+                for valor, texto in zip(pares[codigo], pares[rotulo]):
+                    rotulos[rotulo].setdefault(valor, texto)
+            datas = bloco['DateModified'][bloco['DateModified'] != '']
+            if len(datas):
+                maior = max(_data(data) for data in datas.unique())
+                ultima = maior if ultima is None else max(ultima, maior)
+    return ultima, rotulos
+
+
+def _registros(url, timeout):
+    # Segue @odata.nextLink até a última página. Cada $filter gera URLs
+    # novas, então as páginas não passam pelo cache em disco de remoto.
+    while url:
+        resposta = remoto.requisitar(url, timeout=timeout)
+        resposta.raise_for_status()
+        corpo = resposta.json()
+        yield from corpo.get('value', [])
+        url = corpo.get('@odata.nextLink')
+
+
+def _rotulos_dimensao(url_base, dimensao, timeout):
+    url = f'{url_base}/DIMENSION/{dimensao}/DimensionValues'
+    return {valor['Code']: valor['Title'] for valor in _registros(url, timeout)}
+
+
+def buscar_alteracoes(indicador, desde, url_base=URL_GHO, timeout=remoto.TIMEOUT):
+    # Só as linhas de países modificadas depois de desde (ou todas, se
+    # desde for None), na ordem em que a API as devolve.
+    url = f'{url_base}/{indicador}'
+    if desde is not None:
+        url += '?$filter=' + quote(f'Date gt {_formatar_data(desde)}')
+    return [registro for registro in _registros(url, timeout) if registro.get('SpatialDimType') == 'COUNTRY']
+
+
+def _para_linha(registro, rotulos, buscar_rotulo):
+    # Converte um registro da API para as colunas da exportação em CSV.
+    def rotulo(coluna, codigo, dimensao):
+        if codigo is None:
+            return ''
+        if codigo not in rotulos[coluna] and dimensao:
+            rotulos[coluna].update(buscar_rotulo(dimensao))
+        return rotulos[coluna].get(codigo, codigo)
+
+    def texto(valor):
+        return '' if valor is None else str(valor)
+
+    return {
+        'IndicatorCode': registro['IndicatorCode'],
+        'Indicator': rotulos['Indicator'].get(registro['IndicatorCode'], registro['IndicatorCode']),
+        'ValueType': 'numeric',
+        'ParentLocationCode': texto(registro.get('ParentLocationCode')),
+        'ParentLocation': texto(registro.get('ParentLocation')),
+        'Location type': TIPOS_DIMENSAO.get(registro.get('SpatialDimType'), texto(registro.get('SpatialDimType'))),
+        'SpatialDimValueCode': registro['SpatialDim'],
+        'Location': rotulo('Location', registro['SpatialDim'], 'COUNTRY'),
+        'Period type': TIPOS_DIMENSAO.get(registro.get('TimeDimType'), texto(registro.get('TimeDimType'))),
+        'Period': texto(registro['TimeDim']),
+        'Dim1 type': TIPOS_DIMENSAO.get(registro.get('Dim1Type'), texto(registro.get('Dim1Type'))),
+        'Dim1': rotulo('Dim1', registro.get('Dim1'), registro.get('Dim1Type')),
+        'Dim1ValueCode': texto(registro.get('Dim1')),
+        'Dim2 type': TIPOS_DIMENSAO.get(registro.get('Dim2Type'), texto(registro.get('Dim2Type'))),
+        'Dim2': rotulo('Dim2', registro.get('Dim2'), registro.get('Dim2Type')),
+        'Dim2ValueCode': texto(registro.get('Dim2')),
+        'FactValueNumeric': texto(registro.get('NumericValue')),
+        'FactValueNumericLow': texto(registro.get('Low')),
+        'FactValueNumericHigh': texto(registro.get('High')),
+        'Value': texto(registro.get('Value')),
+        'Language': 'EN',
+        'DateModified': _formatar_data(_data(registro['Date'])),
+    }
+
+
+def _mesclar_csv(caminho_csv, delta, tamanho_bloco):
+    # Reescreve o CSV bloco a bloco: linhas cuja chave veio da API são
+    # trocadas no lugar, as que não existiam vão para o fim.
+    pendentes = dict(delta)
+    # Mantém o fim de linha da exportação (a da OMS vem com CRLF).
+    with open(caminho_csv, 'rb') as arquivo:
+        fim_linha = '\r\n' if arquivo.readline().endswith(b'\r\n') else '\n'
+    colunas = None
+    leitor = pd.read_csv(caminho_csv, dtype=str, keep_default_na=False, chunksize=tamanho_bloco)
+    with leitor, arquivos.escrita_atomica(caminho_csv) as temporario, \
+            open(temporario, 'w', encoding='utf-8', newline='') as arquivo:
+        for bloco in leitor:
+            if colunas is None:
+                colunas = list(bloco.columns)
+            chaves = list(zip(*(bloco[coluna] for coluna in CHAVE_ORIGEM)))
+            for posicao, chave in enumerate(chaves):
+                linha = pendentes.pop(chave, None)
+                if linha is not None:
+                    # Colunas que a API não devolve ficam como estavam.
+                    atual = bloco.iloc[posicao]
+                    bloco.iloc[posicao] = [linha.get(coluna, atual[coluna]) for coluna in colunas]
+            bloco.to_csv(arquivo, header=arquivo.tell() == 0, index=False, lineterminator=fim_linha)
+        novas = pd.DataFrame([[linha.get(coluna, '') for coluna in colunas] for linha in pendentes.values()],
+                             columns=colunas)
+        novas.to_csv(arquivo, header=False, index=False, lineterminator=fim_linha)
+    return len(delta) - len(pendentes), len(pendentes)
+
+
+def _mesclar_parquet(limpo, delta_limpo):
+    # Mesma regra de _mesclar_csv sobre o frame já limpo: o resultado é o
+    # que converter_csv geraria do CSV novo, sem refazer a limpeza inteira.
+    # Todas as colunas vêm do delta: a API também corrige nomes e regiões.
+    chaves = pd.MultiIndex.from_arrays([limpo[coluna].astype(object) for coluna in CHAVE_LIMPA])
+    chaves_delta = pd.MultiIndex.from_arrays([delta_limpo[coluna].astype(object) for coluna in CHAVE_LIMPA])
+    posicoes = chaves.get_indexer(chaves_delta)
+    existentes = posicoes >= 0
+
+    atualizado = {}
+    for coluna in COLUNAS:
+        valores = limpo[coluna].to_numpy(dtype=object if coluna in COLUNAS_CATEGORICAS else None).copy()
+        novos = delta_limpo[coluna].to_numpy(dtype=object if coluna in COLUNAS_CATEGORICAS else None)
+        valores[posicoes[existentes]] = novos[existentes]
+        atualizado[coluna] = valores
+    mesclado = pd.concat([pd.DataFrame(atualizado), delta_limpo[~existentes]], ignore_index=True)
+    for coluna in COLUNAS_CATEGORICAS:
+        mesclado[coluna] = _traduzir(mesclado[coluna].astype(object), {})
+    mesclado['ano'] = mesclado['ano'].astype(limpo['ano'].dtype)
+    mesclado['mortes'] = pd.to_numeric(mesclado['mortes'], downcast='integer')
+    return mesclado
+
+
+def atualizar(caminho_csv='data.csv', indicador=INDICADOR_PADRAO, url_base=URL_GHO,
+              timeout=remoto.TIMEOUT, tamanho_bloco=TAMANHO_BLOCO):
+    # Traz da API só o que mudou desde a última sincronização e mescla no
+    # CSV e no parquet limpo. O parquet é gravado por último, então os
+    # processos do painel só releem o parquet, sem refazer a limpeza. O
+    # cubo é somado de novo, mas figuras e mapas são guardados pelos
+    # números que mostram (ver graficos): só os que mudaram são refeitos.
+    estado = _ler_estado(caminho_csv)
+    ultima, rotulos = _examinar_csv(caminho_csv, tamanho_bloco)
+    if estado.get('sincronizado_ate'):
+        ultima = _data(estado['sincronizado_ate'])
+
+    registros = buscar_alteracoes(indicador, ultima, url_base, timeout)
+    resumo = {'atualizadas': 0, 'novas': 0, 'sincronizado_ate': None if ultima is None else _formatar_data(ultima),
+              'paises': [], 'anos': [], 'causas': []}
+    if not registros:
+        return resumo
+
+    linhas = [_para_linha(registro, rotulos, lambda dimensao: _rotulos_dimensao(url_base, dimensao, timeout))
+              for registro in registros]
+    # Uma chave repetida entre páginas vale pela última ocorrência.
+    delta = {tuple(linha[coluna] for coluna in CHAVE_ORIGEM): linha for linha in linhas}
+
+    destino = caminho_parquet(caminho_csv)
+    parquet_valido = not _desatualizado(caminho_csv, destino)
+
+    resumo['atualizadas'], resumo['novas'] = _mesclar_csv(caminho_csv, delta, tamanho_bloco)
+
+    bruto = pd.DataFrame(list(delta.values()))[COLUNAS_ORIGEM]
+    bruto['Period'] = pd.to_numeric(bruto['Period'])
+    bruto['FactValueNumeric'] = pd.to_numeric(bruto['FactValueNumeric'])
+    delta_limpo = limpar_dados(bruto.astype(TIPOS_ORIGEM))
+    if parquet_valido:
+        gravar_parquet(_mesclar_parquet(ler_parquet(destino), delta_limpo), destino, caminho_csv)
+
+    ultima = max([_data(linha['DateModified']) for linha in delta.values()] + ([ultima] if ultima else []))
+    _gravar_estado(caminho_csv, {'indicador': indicador, 'sincronizado_ate': _formatar_data(ultima)})
+
+    resumo['sincronizado_ate'] = _formatar_data(ultima)
+    resumo['paises'] = sorted(delta_limpo['pais'].astype(str).unique())
+    resumo['anos'] = sorted(int(ano) for ano in delta_limpo['ano'].unique())
+    resumo['causas'] = sorted(delta_limpo['causa'].astype(str).unique())
+    return resumo
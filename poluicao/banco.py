@@ -0,0 +1,304 @@
+import functools
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+from poluicao import arquivos
+from poluicao.agregados import CAUSA_TOTAL, CHAVES_CUBO
+from poluicao.dados import COLUNAS
+from poluicao.instrumentacao import etapa
+
+MOTORES = ('sqlite', 'duckdb')
+
+EXTENSOES = {'sqlite': '.sqlite', 'duckdb': '.duckdb'}
+
+# Incrementar sempre que a tabela ou os índices mudarem.
+VERSAO_BANCO = '3'
+
+# O primeiro índice atende os cartões e as views filtradas por causa e
+# continente; o segundo, as consultas por causa e ano do mapa e da
+# tendência anual; o terceiro, o detalhamento de um país.
+INDICES = {
+    'idx_causa_continente_pais_ano': ['causa', 'continente', 'pais', 'ano'],
+    'idx_causa_ano': ['causa', 'ano'],
+    'idx_pais_causa_ano': ['pais', 'causa', 'ano'],
+}
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def limpar_cache():
+    with _lock:
+        _cache.clear()
+
+
+def caminho_banco(caminho_origem, motor='sqlite'):
+    return os.path.splitext(caminho_origem)[0] + EXTENSOES[motor]
+
+
+def _conectar(caminho, motor, somente_leitura=True):
+    if motor == 'sqlite':
+        if somente_leitura:
+            return sqlite3.connect(f'file:{caminho}?mode=ro', uri=True, check_same_thread=False)
+        return sqlite3.connect(caminho)
+    if motor == 'duckdb':
+        # Opcional: só é importado quando escolhido.
+        try:
+            import duckdb
+        except ImportError as erro:
+            raise ImportError('o backend duckdb precisa do pacote duckdb (pip install duckdb)') from erro
+        return duckdb.connect(caminho, read_only=somente_leitura)
+    raise ValueError(f'motor desconhecido: {motor!r} (use um de {", ".join(MOTORES)})')
+
+
+def exportar(df, destino, motor='sqlite', assinatura_origem=None):
+    # Grava o frame limpo (o de carregar_dados ou carregar_indicador) numa
+    # tabela indexada; assim como o parquet, o arquivo só aparece completo.
+    linhas = df[COLUNAS].astype({coluna: object for coluna in COLUNAS if coluna not in ('ano', 'mortes')})
+    # Taxas (indicadores da loja) ficam em ponto flutuante.
+    contagem = pd.api.types.is_integer_dtype(df['mortes'])
+    linhas = linhas.astype({'ano': 'int64', 'mortes': 'int64' if contagem else 'float64'})
+    with arquivos.escrita_atomica(destino) as temporario:
+        conexao = _conectar(temporario, motor, somente_leitura=False)
+        try:
+            conexao.execute(
+                'CREATE TABLE dados (continente TEXT, pais TEXT, pais_code TEXT, ano INTEGER, '
+                f'causa TEXT, causa_code TEXT, mortes {"BIGINT" if contagem else "DOUBLE"})'
+            )
+            if motor == 'duckdb':
+                # O DuckDB lê o frame direto, sem passar linha a linha pelo Python.
+                conexao.register('frame', linhas)
+                conexao.execute('INSERT INTO dados SELECT * FROM frame')
+                conexao.unregister('frame')
+            else:
+                conexao.executemany('INSERT INTO dados VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                    linhas.itertuples(index=False, name=None))
+            for nome, colunas in INDICES.items():
+                conexao.execute(f'CREATE INDEX {nome} ON dados ({", ".join(colunas)})')
+
+            conexao.execute('CREATE TABLE meta (chave TEXT, valor TEXT)')
+            mtime, tamanho = assinatura_origem or (0, 0)
+            conexao.executemany('INSERT INTO meta VALUES (?, ?)', [
+                ('versao', VERSAO_BANCO),
+                ('origem_mtime_ns', str(mtime)),
+                ('origem_tamanho', str(tamanho)),
+            ])
+            conexao.commit()
+        finally:
+            conexao.close()
+    return destino
+
+
+def _desatualizado(destino, motor, assinatura_origem):
+    if not os.path.exists(destino):
+        return True
+    conexao = _conectar(destino, motor)
+    try:
+        meta = dict(conexao.execute('SELECT chave, valor FROM meta').fetchall())
+    finally:
+        conexao.close()
+    return meta != {
+        'versao': VERSAO_BANCO,
+        'origem_mtime_ns': str(assinatura_origem[0]),
+        'origem_tamanho': str(assinatura_origem[1]),
+    }
+
+
+def _indice(niveis, linhas):
+    if len(niveis) == 1:
+        return pd.Index([linha[0] for linha in linhas], name=niveis[0], dtype=object)
+    return pd.MultiIndex.from_tuples([linha[:-1] for linha in linhas], names=niveis)
+
+
+class AgregadosSQL:
+    # Mesma interface de Agregados, mas cada rollup e cada seleção viram
+    # uma consulta no banco, que pode ser compartilhado por vários processos.
+    def __init__(self, caminho, motor='sqlite'):
+        self.caminho = caminho
+        self.motor = motor
+        self._conexao = _conectar(caminho, motor)
+        self._lock = threading.Lock()
+
+        # Como em Agregados: False para taxas, que não são somáveis.
+        tipos = {linha[1]: linha[2] for linha in self._consultar("PRAGMA table_info('dados')")}
+        self.contagem = tipos['mortes'].upper() == 'BIGINT'
+
+        # Mesma regra de Agregados._todas: sem a linha "Todas as causas", o
+        # total é a soma das causas.
+        self.tem_total = bool(self._consultar('SELECT 1 FROM dados WHERE causa = ? LIMIT 1', (CAUSA_TOTAL,)))
+        self.total_mortes = self._numero(self._escalar(
+            f'SELECT SUM(mortes) FROM dados{" WHERE causa = ?" if self.tem_total else ""}',
+            tuple(self._total().values()),
+        ))
+
+        # Os cartões do topo somam todas as linhas, inclusive "Todas as causas".
+        self.por_pais = self._serie(['pais'])
+        self.por_continente_geral = self._serie(['continente'])
+        self.por_ano_geral = self._serie(['ano'])
+
+        self.continente_mais_mortes = self.por_continente_geral.idxmax()
+        self.pais_mais_mortes = self.por_pais.idxmax()
+        self.mortes_pais_mais_mortes = self._numero(self.por_pais.max())
+
+        self._rankings = {}
+        self.codigos_paises = dict(self._consultar(
+            'SELECT pais, MIN(pais_code) FROM dados GROUP BY pais ORDER BY MIN(rowid)'
+        ))
+
+        # Ordem de aparição, como df[...].unique() no caminho em memória.
+        self.continentes = [linha[0] for linha in self._consultar(
+            'SELECT continente FROM dados GROUP BY continente ORDER BY MIN(rowid)'
+        )]
+        self.causas = [linha[0] for linha in self._consultar(
+            'SELECT causa FROM dados GROUP BY causa ORDER BY MIN(rowid)'
+        )]
+        self.anos = [int(a) for a in self.por_ano_geral.index]
+
+    def _consultar(self, sql, parametros=()):
+        with self._lock, etapa('consulta_sql'):
+            return self._conexao.execute(sql, parametros).fetchall()
+
+    def _escalar(self, sql, parametros=()):
+        return self._consultar(sql, parametros)[0][0] or 0
+
+    def _numero(self, valor):
+        return int(valor) if self.contagem else float(valor)
+
+    def _total(self, **filtros):
+        # Filtros de uma consulta de "Todas as causas".
+        return {'causa': CAUSA_TOTAL, **filtros} if self.tem_total else filtros
+
+    @property
+    def _tipo(self):
+        return 'int64' if self.contagem else 'float64'
+
+    def _serie(self, niveis, filtros=None):
+        filtros = filtros or {}
+        onde = ' AND '.join(f'{coluna} = ?' for coluna in filtros)
+        colunas = ', '.join(niveis)
+        linhas = self._consultar(
+            f'SELECT {colunas}, SUM(mortes) FROM dados'
+            f'{" WHERE " + onde if onde else ""} GROUP BY {colunas} ORDER BY {colunas}',
+            tuple(filtros.values()),
+        )
+        return pd.Series([linha[-1] for linha in linhas], index=_indice(niveis, linhas),
+                         name='mortes', dtype=self._tipo)
+
+    @functools.cached_property
+    def cubo(self):
+        return self._serie(CHAVES_CUBO)
+
+    @functools.cached_property
+    def por_continente(self):
+        return self._serie(['continente'], self._total())
+
+    @functools.cached_property
+    def por_continente_ano(self):
+        return self._serie(['continente', 'ano'], self._total())
+
+    @functools.cached_property
+    def por_ano(self):
+        return self._serie(['ano'], self._total())
+
+    @functools.cached_property
+    def por_causa(self):
+        return self._serie(['causa'])
+
+    @functools.cached_property
+    def por_causa_ano(self):
+        return self._serie(['causa', 'ano'])
+
+    @functools.cached_property
+    def paises(self):
+        return sorted(self.codigos_paises)
+
+    def serie_pais(self, pais):
+        # Mortes do país por ano (linhas) e causa (colunas), completando com
+        # zero as combinações que não estão no banco, como em Agregados.
+        serie = self._serie(['ano', 'causa'], {'pais': pais})
+        return serie.unstack('causa', fill_value=0).reindex(
+            index=pd.Index(self.anos, name='ano'),
+            columns=pd.Index(self.causas, name='causa'),
+            fill_value=0,
+        )
+
+    def _soma(self, filtros):
+        onde = ' AND '.join(f'{coluna} = ?' for coluna in filtros)
+        return self._numero(self._escalar(f'SELECT SUM(mortes) FROM dados WHERE {onde}', tuple(filtros.values())))
+
+    def mortes_pais(self, pais, causa=CAUSA_TOTAL):
+        if causa == CAUSA_TOTAL:
+            return self._soma(self._total(pais=pais))
+        return self._soma({'pais': pais, 'causa': causa})
+
+    def mortes_continente(self, continente):
+        return self._soma(self._total(continente=continente))
+
+    def mortes_causa(self, causa):
+        return self._numero(self._escalar('SELECT SUM(mortes) FROM dados WHERE causa = ?', (causa,)))
+
+    def mortes_ano(self, ano, causa=CAUSA_TOTAL):
+        if causa == CAUSA_TOTAL:
+            return self._soma(self._total(ano=int(ano)))
+        return self._soma({'causa': causa, 'ano': int(ano)})
+
+    def mortes_ano_geral(self, ano):
+        return self._numero(self.por_ano_geral.get(ano, 0))
+
+    def serie_continente(self, continente):
+        return self._serie(['ano'], self._total(continente=continente))
+
+    def serie_causa(self, causa):
+        return self._serie(['ano'], {'causa': causa})
+
+    def ranking_paises(self, n=None, ano=None, causa=None):
+        # Sem ano nem causa o ranking soma todas as linhas, como o cartão
+        # "País com mais mortes".
+        chave = (n, ano, causa)
+        ranking = self._rankings.get(chave)
+        if ranking is not None:
+            return ranking
+
+        filtros = {'causa': causa, 'ano': None if ano is None else int(ano)}
+        filtros = {coluna: valor for coluna, valor in filtros.items() if valor is not None}
+        onde = ' AND '.join(f'{coluna} = ?' for coluna in filtros)
+        linhas = self._consultar(
+            f'SELECT pais, SUM(mortes) AS total FROM dados{" WHERE " + onde if onde else ""} '
+            f'GROUP BY pais ORDER BY total DESC, pais{f" LIMIT {int(n)}" if n else ""}',
+            tuple(filtros.values()),
+        )
+        ranking = pd.DataFrame({
+            'pais': pd.Series([linha[0] for linha in linhas], dtype=object),
+            'pais_code': pd.Series([self.codigos_paises[linha[0]] for linha in linhas], dtype=object),
+            'mortes': pd.Series([linha[1] for linha in linhas], dtype=self._tipo),
+        })
+        self._rankings[chave] = ranking
+        return ranking
+
+    def top_paises(self, n=10):
+        return self.ranking_paises(n)
+
+
+def obter_agregados_sql(caminho_origem, carregar, motor='sqlite'):
+    # caminho_origem é o arquivo que, ao mudar, obriga a refazer o banco
+    # (o CSV ou a partição do indicador); carregar devolve o frame limpo e
+    # só é chamado nesse caso. O banco fica ao lado da origem, e todos os
+    # processos que o abrirem compartilham o mesmo arquivo.
+    caminho_origem = os.path.abspath(caminho_origem)
+    chave = (caminho_origem, motor)
+    with _lock:
+        assinatura = arquivos.assinatura(caminho_origem)
+        em_cache = _cache.get(chave)
+        if em_cache is not None and em_cache[0] == assinatura:
+            return em_cache[1]
+
+        destino = caminho_banco(caminho_origem, motor)
+        if _desatualizado(destino, motor, assinatura):
+            exportar(carregar(), destino, motor, assinatura)
+
+        agregados = AgregadosSQL(destino, motor)
+        _cache[chave] = (assinatura, agregados)
+        return agregados
@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from poluicao import arquivos
+from poluicao.agregados import CHAVES_CUBO, Agregados
+from poluicao.instrumentacao import etapa
+
+# Incrementar sempre que o conteúdo dos arquivos .arrow mudar.
+VERSAO_COMPARTILHADO = '2'
+
+_cache_dados = {}
+_cache_agregados = {}
+_lock = threading.Lock()
+
+
+def limpar_cache():
+    with _lock:
+        _cache_dados.clear()
+        _cache_agregados.clear()
+
+
+def caminho_dados(caminho_origem):
+    return os.path.splitext(caminho_origem)[0] + '.arrow'
+
+
+def caminho_cubo(caminho_origem):
+    return os.path.splitext(caminho_origem)[0] + '.cubo.arrow'
+
+
+def _metadados(assinatura_origem, extras=None):
+    return {
+        b'poluicao_versao': VERSAO_COMPARTILHADO.encode(),
+        b'poluicao_origem': json.dumps(list(assinatura_origem)).encode(),
+        **(extras or {}),
+    }
+
+
+def _gravar(tabela, destino):
+    # Arrow IPC sem compressão: o arquivo é mapeado direto na memória, e as
+    # páginas ficam no cache do sistema, uma vez por máquina, para todos os
+    # processos que o abrirem.
+    with arquivos.escrita_atomica(destino) as temporario:
+        with pa.OSFile(temporario, 'wb') as arquivo:
+            with ipc.new_file(arquivo, tabela.schema) as escritor:
+                escritor.write_table(tabela)
+    return destino
+
+
+def _abrir(caminho):
+    return ipc.open_file(pa.memory_map(caminho, 'r')).read_all()
+
+
+def _desatualizado(caminho, assinatura_origem):
+    if not os.path.exists(caminho):
+        return True
+    metadados = ipc.open_file(pa.memory_map(caminho, 'r')).schema.metadata or {}
+    return any(metadados.get(chave) != valor for chave, valor in _metadados(assinatura_origem).items())
+
+
+def _para_pandas(tabela):
+    # to_pandas copiaria os códigos das categorias; montando o Categorical
+    # direto sobre o buffer mapeado, nenhuma coluna é copiada. Os arrays
+    # ficam somente leitura, então quem precisar alterá-los trabalha numa
+    # cópia, como já vale para o frame de carregar_dados.
+    colunas = {}
+    for nome, coluna in zip(tabela.column_names, tabela.columns):
+        # Um único lote por arquivo (ver _gravar); juntar lotes copiaria.
+        coluna = coluna.chunk(0) if coluna.num_chunks == 1 else coluna.combine_chunks()
+        if pa.types.is_dictionary(coluna.type):
+            valores = pd.Categorical.from_codes(
+                coluna.indices.to_numpy(zero_copy_only=True),
+                categories=pd.Index(coluna.dictionary.to_pylist()),
+                validate=False,
+            )
+        else:
+            valores = coluna.to_numpy(zero_copy_only=True)
+        colunas[nome] = pd.Series(valores, name=nome, copy=False)
+    return pd.DataFrame(colunas, copy=False)
+
+
+def publicar(df, agregados, caminho_origem):
+    # O frame chega com as categorias já em ordem alfabética (ver
+    # _traduzir), e essa ordem vira a do dicionário gravado.
+    assinatura = arquivos.assinatura(caminho_origem)
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    _gravar(tabela.replace_schema_metadata(_metadados(assinatura)), caminho_dados(caminho_origem))
+
+    cubo = agregados.cubo.reset_index()
+    for chave in CHAVES_CUBO:
+        if chave != 'ano':
+            cubo[chave] = cubo[chave].astype('category')
+            cubo[chave] = cubo[chave].cat.reorder_categories(sorted(cubo[chave].cat.categories))
+    tabela = pa.Table.from_pandas(cubo, preserve_index=False)
+    extras = {b'poluicao_agregados': json.dumps({
+        'codigos_paises': agregados.codigos_paises,
+        'continentes': agregados.continentes,
+        'causas': agregados.causas,
+    }, ensure_ascii=False).encode('utf-8')}
+    _gravar(tabela.replace_schema_metadata(_metadados(assinatura, extras)), caminho_cubo(caminho_origem))
+
+
+def _garantir(caminho_origem, carregar, assinatura):
+    if _desatualizado(caminho_dados(caminho_origem), assinatura) or \
+            _desatualizado(caminho_cubo(caminho_origem), assinatura):
+        df = carregar()
+        publicar(df, Agregados(df), caminho_origem)
+
+
+def carregar_compartilhado(caminho_origem, carregar):
+    # Frame limpo mapeado do arquivo .arrow ao lado da origem, refeito com
+    # carregar() quando a origem muda. Como em obter_agregados_sql,
+    # caminho_origem é o CSV ou a partição do indicador.
+    caminho_origem = os.path.abspath(caminho_origem)
+    with _lock:
+        assinatura = arquivos.assinatura(caminho_origem)
+        em_cache = _cache_dados.get(caminho_origem)
+        if em_cache is not None and em_cache[0] == assinatura:
+            return em_cache[1]
+
+        _garantir(caminho_origem, carregar, assinatura)
+        with etapa('mapeamento'):
+            df = _para_pandas(_abrir(caminho_dados(caminho_origem)))
+        _cache_dados[caminho_origem] = (assinatura, df)
+        return df
+
+
+def obter_agregados_compartilhados(caminho_origem, carregar):
+    # Agregados montados sobre o cubo mapeado: nenhum processo precisa
+    # ler o frame linha a linha nem refazer o groupby.
+    caminho_origem = os.path.abspath(caminho_origem)
+    with _lock:
+        assinatura = arquivos.assinatura(caminho_origem)
+        em_cache = _cache_agregados.get(caminho_origem)
+        if em_cache is not None and em_cache[0] == assinatura:
+            return em_cache[1]
+
+        _garantir(caminho_origem, carregar, assinatura)
+        with etapa('mapeamento'):
+            tabela = _abrir(caminho_cubo(caminho_origem))
+            cubo = _para_pandas(tabela)
+            extras = json.loads(tabela.schema.metadata[b'poluicao_agregados'])
+            serie = pd.Series(
+                cubo['mortes'].to_numpy(),
+                index=pd.MultiIndex.from_arrays([cubo[chave] for chave in CHAVES_CUBO]),
+                name='mortes',
+                copy=False,
+            )
+        agregados = Agregados.do_cubo(serie, extras['codigos_paises'], extras['continentes'], extras['causas'])
+        _cache_agregados[caminho_origem] = (assinatura, agregados)
+        return agregados
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from poluicao.agregados import CAUSA_TOTAL, _sem_categorias, obter_agregados
+
+
+def _agregados(dados):
+    if isinstance(dados, pd.DataFrame):
+        return obter_agregados(dados)
+    return dados
+
+
+def _filtrar(cubo, filtros):
+    mascara = np.ones(len(cubo), dtype=bool)
+    for nivel, valor in filtros.items():
+        if valor is None:
+            continue
+        valores = cubo.index.get_level_values(nivel)
+        if isinstance(valor, (list, tuple, set)):
+            mascara &= np.asarray(valores.isin(list(valor)))
+        else:
+            mascara &= np.asarray(valores == valor)
+    return cubo[mascara]
+
+
+def mortes(dados, por=(), continente=None, pais=None, ano=None, causa=CAUSA_TOTAL):
+    # dados pode ser o frame de carregar_dados ou um Agregados. Cada filtro
+    # aceita um valor ou uma lista; None não filtra. Por padrão só entram
+    # as linhas de "Todas as causas", para não somar cada morte duas vezes;
+    # indicadores sem essa linha somam as causas, como em Agregados._todas.
+    agregados = _agregados(dados)
+    if causa == CAUSA_TOTAL and not agregados.tem_total:
+        causa = None
+    cubo = _filtrar(agregados.cubo, {
+        'continente': continente,
+        'pais': pais,
+        'ano': ano,
+        'causa': causa,
+    })
+    if isinstance(por, str):
+        por = [por]
+    if not por:
+        # Inteiro para contagens, float para taxas.
+        return agregados._numero(cubo.sum())
+    return _sem_categorias(cubo.groupby(level=list(por), observed=True).sum())
+
+
+def mortes_por_continente(dados, **filtros):
+    return mortes(dados, por='continente', **filtros)
+
+
+def mortes_por_pais(dados, **filtros):
+    return mortes(dados, por='pais', **filtros)
+
+
+def mortes_por_ano(dados, **filtros):
+    return mortes(dados, por='ano', **filtros)
+
+
+def mortes_por_causa(dados, **filtros):
+    filtros.setdefault('causa', None)
+    return mortes(dados, por='causa', **filtros)
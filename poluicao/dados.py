@@ -0,0 +1,207 @@
+import json
+import os
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from poluicao import arquivos
+from poluicao.instrumentacao import etapa
+
+COLUNAS_ORIGEM = ['ParentLocation', 'SpatialDimValueCode', 'Location', 'Period',
+                  'Dim1ValueCode', 'Dim2', 'Dim2ValueCode', 'FactValueNumeric']
+
+COLUNAS = ['continente', 'pais', 'pais_code', 'ano', 'causa', 'causa_code', 'mortes']
+
+TIPOS_ORIGEM = {
+    'ParentLocation': 'category',
+    'SpatialDimValueCode': 'category',
+    'Location': 'category',
+    'Dim1ValueCode': 'category',
+    'Dim2': 'category',
+    'Dim2ValueCode': 'category',
+}
+
+RENOMEAR_COLUNAS = {
+    'ParentLocation': 'continente',
+    'SpatialDimValueCode': 'pais_code',
+    'Location': 'pais',
+    'Period': 'ano',
+    'Dim1ValueCode': 'dim1_code',
+    'Dim2': 'causa',
+    'Dim2ValueCode': 'causa_code',
+    'FactValueNumeric': 'mortes'
+}
+
+renomear_continentes = {
+    'Americas': 'Américas',
+    'Africa': 'África',
+    'Western Pacific': 'Pacífico Ocidental',
+    'Europe': 'Europa',
+    'South-East Asia': 'Sudeste Asiático',
+    'Eastern Mediterranean': 'Mediterrâneo Oriental'
+}
+
+traducao_causas = {
+    "ALL CAUSES": "Todas as causas",
+    "Trachea, bronchus, lung cancers": "Câncer",
+    "Chronic obstructive pulmonary disease": "Obstrução da respiração",
+    "Acute lower respiratory infections": "Infecções respiratórias",
+    "Stroke": "AVC",
+    "Ischaemic heart disease": "Doença cardíaca isquêmica"
+}
+
+ANO_INICIAL = 2014
+
+# Recortes por sexo; o painel mostra só o total de ambos os sexos.
+SEXOS_EXCLUIDOS = ['SEX_MLE', 'SEX_FMLE']
+
+# Incrementar sempre que limpar_dados mudar o formato gravado no parquet.
+VERSAO_FORMATO = b'5'
+
+# Linhas do CSV lidas por vez: o pico de memória da conversão depende deste
+# número, não do tamanho da exportação.
+TAMANHO_BLOCO = 200_000
+
+# Tipos fixos para que todos os blocos gravados tenham o mesmo esquema; as
+# colunas de texto voltam como categorias na leitura.
+ESQUEMA_PARQUET = pa.schema([
+    ('continente', pa.string()),
+    ('pais', pa.string()),
+    ('pais_code', pa.string()),
+    ('ano', pa.int16()),
+    ('causa', pa.string()),
+    ('causa_code', pa.string()),
+    ('mortes', pa.int32()),
+])
+
+COLUNAS_CATEGORICAS = ['continente', 'pais', 'pais_code', 'causa', 'causa_code']
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _traduzir(coluna, traducao):
+    coluna = coluna.astype('category').cat.remove_unused_categories()
+    coluna = coluna.cat.rename_categories(traducao)
+    # Mantém a ordem alfabética dos rótulos já traduzidos, que é a ordem
+    # em que os gráficos sempre exibiram continentes e causas.
+    return coluna.cat.reorder_categories(sorted(coluna.cat.categories))
+
+
+def preparar_painel(df, ano_inicial=ANO_INICIAL, contagem=True):
+    # Recebe colunas já renomeadas (ver RENOMEAR_COLUNAS), venham do CSV ou
+    # de uma partição da loja de indicadores. ano_inicial=None mantém todos
+    # os anos; contagem=False (taxas) mantém os valores com as casas
+    # decimais, sem arredondar para inteiro.
+    filtro = ~df['dim1_code'].isin(SEXOS_EXCLUIDOS)
+    if ano_inicial is not None:
+        filtro &= df['ano'] >= ano_inicial
+    df = df[filtro]
+
+    # As traduções são aplicadas aos rótulos das categorias, não linha a linha.
+    df['continente'] = _traduzir(df['continente'], renomear_continentes)
+    df['causa'] = _traduzir(df['causa'], traducao_causas)
+    df['pais'] = _traduzir(df['pais'], {})
+    df['pais_code'] = _traduzir(df['pais_code'], {})
+    df['causa_code'] = _traduzir(df['causa_code'], {})
+    df['ano'] = pd.to_numeric(df['ano'], downcast='integer')
+    if contagem:
+        df['mortes'] = pd.to_numeric(df['mortes'].round(), downcast='integer')
+    else:
+        df['mortes'] = df['mortes'].astype('float64')
+    return df[COLUNAS].reset_index(drop=True)
+
+
+def limpar_dados(df):
+    return preparar_painel(df.rename(columns=RENOMEAR_COLUNAS))
+
+
+def caminho_parquet(caminho_csv):
+    return os.path.splitext(caminho_csv)[0] + '.parquet'
+
+
+def ler_blocos(caminho_csv, tamanho_bloco=TAMANHO_BLOCO):
+    # Gera o CSV já limpo, um bloco por vez; cada bloco traz só as
+    # categorias que aparecem nele.
+    leitor = pd.read_csv(caminho_csv, usecols=COLUNAS_ORIGEM, dtype=TIPOS_ORIGEM, chunksize=tamanho_bloco)
+    with leitor:
+        for bloco in leitor:
+            yield limpar_dados(bloco)
+
+
+def _esquema(assinatura_origem):
+    # A assinatura (mtime_ns, tamanho) do CSV de origem vai no esquema: o
+    # parquet só vale para aquele CSV, mesmo que um CSV trocado tenha mtime
+    # mais antigo (cp -p, rsync, git checkout).
+    return ESQUEMA_PARQUET.with_metadata({
+        b'poluicao_versao': VERSAO_FORMATO,
+        b'poluicao_origem': json.dumps(list(assinatura_origem)).encode(),
+    })
+
+
+def converter_csv(caminho_csv, destino=None, tamanho_bloco=TAMANHO_BLOCO):
+    destino = destino or caminho_parquet(caminho_csv)
+
+    # Grava em arquivo temporário e troca de uma vez, para que outro
+    # processo nunca leia um parquet pela metade.
+    esquema = _esquema(arquivos.assinatura(caminho_csv))
+    with etapa('conversao_csv'), arquivos.escrita_atomica(destino) as temporario:
+        with pq.ParquetWriter(temporario, esquema) as escritor:
+            for bloco in ler_blocos(caminho_csv, tamanho_bloco):
+                escritor.write_table(pa.Table.from_pandas(bloco, schema=esquema, preserve_index=False))
+    return destino
+
+
+def gravar_parquet(df, destino, caminho_csv):
+    # Para um frame já limpo inteiro na memória (ver atualizacao.atualizar),
+    # com o mesmo esquema e a mesma troca atômica de converter_csv;
+    # caminho_csv é o CSV do qual o frame equivale, já gravado.
+    esquema = _esquema(arquivos.assinatura(caminho_csv))
+    with arquivos.escrita_atomica(destino) as temporario:
+        pq.write_table(pa.Table.from_pandas(df[COLUNAS], schema=esquema, preserve_index=False), temporario)
+    return destino
+
+
+def ler_parquet(caminho):
+    tabela = pq.read_table(caminho, columns=COLUNAS, read_dictionary=COLUNAS_CATEGORICAS)
+    df = tabela.to_pandas()
+    # O dicionário de cada bloco vem na ordem em que apareceu; os gráficos
+    # esperam as categorias em ordem alfabética, como em _traduzir.
+    for coluna in COLUNAS_CATEGORICAS:
+        df[coluna] = df[coluna].cat.reorder_categories(sorted(df[coluna].cat.categories))
+    return df
+
+
+def limpar_cache():
+    with _lock:
+        _cache.clear()
+
+
+def _desatualizado(caminho_csv, destino):
+    if not os.path.exists(destino):
+        return True
+    metadados = pq.read_schema(destino).metadata or {}
+    esperados = _esquema(arquivos.assinatura(caminho_csv)).metadata
+    return any(metadados.get(chave) != valor for chave, valor in esperados.items())
+
+
+def carregar_dados(caminho='data.csv'):
+    # O frame devolvido é compartilhado entre todas as sessões do processo:
+    # quem precisar alterá-lo deve trabalhar sobre uma cópia.
+    caminho = os.path.abspath(caminho)
+    with _lock:
+        assinatura = arquivos.assinatura(caminho)
+        em_cache = _cache.get(caminho)
+        if em_cache is not None and em_cache[0] == assinatura:
+            return em_cache[1]
+
+        destino = caminho_parquet(caminho)
+        if _desatualizado(caminho, destino):
+            converter_csv(caminho, destino)
+
+        with etapa('leitura_parquet'):
+            df = ler_parquet(destino)
+        _cache[caminho] = (assinatura, df)
+        return df
@@ -0,0 +1,113 @@
+import json
+import os
+import re
+import shutil
+import unicodedata
+
+import plotly.offline
+
+from poluicao.formatacao import formatar_em_milhoes, formatar_numero
+from poluicao.graficos import (
+    grafico_causa_anos,
+    grafico_pais,
+    grafico_tendencia_ano,
+    grafico_tendencia_continente,
+    grafico_total_causa,
+    grafico_total_continente,
+)
+from poluicao.mapa import N_PAISES_MAPA, renderizar_mapa
+
+PAGINA = os.path.join(os.path.dirname(__file__), 'recursos', 'estatico.html')
+
+TODOS_OS_ANOS = "Todos os anos"
+
+
+def _slug(texto):
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', '-', texto.lower()).strip('-') or 'todos'
+
+
+def _gravar(destino, conteudo):
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    with open(destino, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(conteudo)
+
+
+def _views(agregados):
+    # Uma entrada por botão do app: (título, rótulo do selectbox, opções,
+    # figura, destaque, total). Os números são os mesmos que o app mostra
+    # ao lado de cada gráfico.
+    total = agregados.total_mortes
+    return [
+        ("Total de Mortes por Continente", "Selecione um Continente", agregados.continentes,
+         lambda c: grafico_total_continente(agregados, c),
+         agregados.mortes_continente, lambda c: total),
+        ("Tendência de Mortes por Continente", "Selecione um Continente para destacar", agregados.continentes,
+         lambda c: grafico_tendencia_continente(agregados, c),
+         lambda c: int(agregados.serie_continente(c).sum()), lambda c: None),
+        ("Causas das mortes ao longo dos anos", "Selecione uma Causa", agregados.causas,
+         lambda c: grafico_causa_anos(agregados, c),
+         agregados.mortes_causa, lambda c: None),
+        ("Tendência de Mortes por Ano", "Selecione um Ano", [TODOS_OS_ANOS] + agregados.anos,
+         lambda a: grafico_tendencia_ano(agregados, None if a == TODOS_OS_ANOS else a),
+         lambda a: total if a == TODOS_OS_ANOS else agregados.mortes_ano(a),
+         lambda a: None if a == TODOS_OS_ANOS else total),
+        ("Total de Mortes por Causa", "Selecione uma Causa", agregados.causas,
+         lambda c: grafico_total_causa(agregados, c),
+         agregados.mortes_causa, lambda c: total),
+        ("Detalhes por País", "Selecione um País", agregados.paises,
+         lambda p: grafico_pais(agregados, p),
+         agregados.mortes_pais, lambda p: total),
+    ]
+
+
+def exportar_estatico(agregados, destino, titulo="Mortes atribuídas à poluição do ar no ano de 2014 ~ 2019"):
+    # Roda cada view para cada opção do seu selectbox, mais o mapa para cada
+    # combinação de ano e causa, e grava tudo como arquivos estáticos: o
+    # pacote resultante pode ser servido por qualquer servidor de arquivos
+    # ou CDN, sem Python no caminho da requisição.
+    os.makedirs(destino, exist_ok=True)
+    manifesto = {
+        'titulo': titulo,
+        'kpis': {
+            'total': formatar_em_milhoes(agregados.total_mortes),
+            'continente_mais_mortes': agregados.continente_mais_mortes,
+            'pais_mais_mortes': f'{agregados.pais_mais_mortes} ({formatar_numero(agregados.mortes_pais_mais_mortes)})',
+            'em_2018': formatar_em_milhoes(agregados.mortes_ano_geral(2018)),
+        },
+        'views': [],
+        'n_paises_mapa': N_PAISES_MAPA,
+        'mapas': [],
+    }
+
+    for titulo_view, rotulo, opcoes, figura, destaque, total in _views(agregados):
+        pasta = f'graficos/{_slug(titulo_view)}'
+        view = {'titulo': titulo_view, 'rotulo': rotulo, 'opcoes': []}
+        for opcao in opcoes:
+            arquivo = f'{pasta}/{_slug(opcao)}.json'
+            _gravar(os.path.join(destino, arquivo), figura(opcao).to_json())
+            view['opcoes'].append({
+                'rotulo': str(opcao),
+                'arquivo': arquivo,
+                'destaque': destaque(opcao),
+                'total': total(opcao),
+            })
+        manifesto['views'].append(view)
+
+    for ano in [None] + agregados.anos:
+        for causa in [None] + agregados.causas:
+            for mundo in (False, True):
+                ranking = agregados.ranking_paises(None if mundo else N_PAISES_MAPA, ano=ano, causa=causa)
+                arquivo = f"mapas/{'mundo' if mundo else 'top'}-{ano or 'todos'}-{_slug(causa or 'todas')}.html"
+                _gravar(os.path.join(destino, arquivo), renderizar_mapa(ranking, mundo=mundo))
+                manifesto['mapas'].append({
+                    'ano': ano,
+                    'causa': causa,
+                    'mundo': mundo,
+                    'arquivo': arquivo,
+                })
+
+    _gravar(os.path.join(destino, 'plotly.min.js'), plotly.offline.get_plotlyjs())
+    shutil.copyfile(PAGINA, os.path.join(destino, 'index.html'))
+    _gravar(os.path.join(destino, 'manifesto.json'), json.dumps(manifesto, ensure_ascii=False, indent=1))
+    return destino
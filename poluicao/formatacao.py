@@ -0,0 +1,75 @@
+import numpy as np
+
+# Os formatadores aceitam um número (e devolvem str) ou um array/Series
+# inteiro de uma vez (e devolvem um array de str), sem laço em Python: os
+# rótulos de uma série com muitos países e anos saem numa só operação.
+
+# Texto dos inteiros de 0 a 999, que cobrem quase todas as partes inteiras
+# dos rótulos; converter int -> str no NumPy é o passo mais caro.
+_INTEIROS = np.array([str(numero) for numero in range(1000)])
+
+# Casa decimal e sufixo de uma vez: índice = décimo + 10 se for milhão.
+_DECIMOS = np.array([f'.{decimo}{sufixo}' for sufixo in 'KM' for decimo in range(10)])
+
+
+def _reais(valores):
+    return np.atleast_1d(np.asarray(valores, dtype='float64'))
+
+
+def _inteiros(valores):
+    # NaN e infinitos entram como 0; _resultado devolve o texto deles.
+    reais = _reais(valores)
+    return np.rint(np.where(np.isfinite(reais), reais, 0)).astype(np.int64)
+
+
+def _texto(inteiros):
+    # inteiros não negativos.
+    grandes = inteiros >= len(_INTEIROS)
+    if not grandes.any():
+        return _INTEIROS[inteiros]
+    textos = _INTEIROS[np.where(grandes, 0, inteiros)].astype('<U20')
+    textos[grandes] = inteiros[grandes].astype(str)
+    return textos
+
+
+def _resultado(valores, inteiros, textos):
+    if (inteiros < 0).any():
+        textos = np.char.add(np.where(inteiros < 0, '-', ''), textos)
+    reais = _reais(valores)
+    invalidos = ~np.isfinite(reais)
+    if invalidos.any():
+        # Como str(valor): 'nan', 'inf', '-inf'.
+        textos = np.where(invalidos, reais.astype(str), textos)
+    return str(textos[0]) if np.ndim(valores) == 0 else textos
+
+
+def formatar_numero(valores):
+    # 1234 -> "1.2K", 2_345_678 -> "2.3M"; abaixo de mil, o próprio número.
+    # O arredondamento é feito em inteiros (décimos de K ou M, metade para
+    # cima), e o que arredonda para 1000.0K já sai como 1.0M.
+    inteiros = _inteiros(valores)
+    absolutos = np.abs(inteiros)
+    decimos = (absolutos * 10 + 500) // 1_000
+    em_milhoes = decimos >= 10_000
+    decimos = np.where(em_milhoes, (absolutos * 10 + 500_000) // 1_000_000, decimos)
+
+    curto = np.char.add(_texto(decimos // 10), _DECIMOS[decimos % 10 + 10 * em_milhoes])
+    return _resultado(valores, inteiros, np.where(absolutos >= 1_000, curto, _texto(np.minimum(absolutos, 999))))
+
+
+def formatar_em_milhoes(valores):
+    # Milhões inteiros, truncados, para os cards: 7_654_321 -> "7 milhões".
+    inteiros = _inteiros(valores)
+    absolutos = np.abs(inteiros)
+    em_milhoes = absolutos >= 1_000_000
+    milhoes = np.char.add(_texto(absolutos // 1_000_000), ' milhões')
+    return _resultado(valores, inteiros, np.where(em_milhoes, milhoes, _texto(np.where(em_milhoes, 0, absolutos))))
+
+
+def formatar_taxa(valores):
+    # Taxas (por 100 mil habitantes, percentuais) com uma casa decimal e sem
+    # sufixo: 12.34 -> "12.3".
+    decimos = _inteiros(_reais(valores) * 10)
+    absolutos = np.abs(decimos)
+    textos = np.char.add(np.char.add(_texto(absolutos // 10), '.'), _INTEIROS[absolutos % 10])
+    return _resultado(valores, decimos, textos)
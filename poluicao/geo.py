@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+
+from shapely.geometry import mapping, shape
+
+from poluicao import arquivos, remoto
+
+URL_GEOJSON = "https://raw.githubusercontent.com/johan/world.geo.json/master/countries.geo.json"
+
+CAMINHO_GEOJSON = os.path.join(os.path.dirname(__file__), 'recursos', 'countries.geo.json')
+
+# Tolerância em graus passada ao simplify e casas decimais mantidas nas
+# coordenadas de cada nível de detalhe.
+NIVEIS_DETALHE = {
+    'alto': (0.0, 4),
+    'medio': (0.05, 3),
+    'baixo': (0.25, 2),
+}
+
+_cache = {}
+_cache_simplificado = {}
+_cache_centroides = {}
+_lock = threading.Lock()
+
+
+def limpar_cache():
+    with _lock:
+        _cache.clear()
+        _cache_simplificado.clear()
+        _cache_centroides.clear()
+
+
+def versao_geojson(caminho=CAMINHO_GEOJSON):
+    return arquivos.assinatura(os.path.abspath(caminho))
+
+
+def carregar_geojson(caminho=CAMINHO_GEOJSON):
+    # Assim como em carregar_dados, o dicionário é compartilhado pelo
+    # processo inteiro e não deve ser modificado.
+    caminho = os.path.abspath(caminho)
+    with _lock:
+        assinatura = arquivos.assinatura(caminho)
+        em_cache = _cache.get(caminho)
+        if em_cache is not None and em_cache[0] == assinatura:
+            return em_cache[1]
+
+        with open(caminho, encoding='utf-8') as arquivo:
+            geojson = json.load(arquivo)
+        _cache[caminho] = (assinatura, geojson)
+        return geojson
+
+
+def _arredondar(coordenadas, casas):
+    if isinstance(coordenadas[0], (int, float)):
+        return [round(coordenadas[0], casas), round(coordenadas[1], casas)]
+    return [_arredondar(c, casas) for c in coordenadas]
+
+
+def _simplificar(geojson, tolerancia, casas):
+    features = []
+    for feature in geojson['features']:
+        geometria = shape(feature['geometry'])
+        if tolerancia:
+            geometria = geometria.simplify(tolerancia, preserve_topology=True)
+        geometria = mapping(geometria)
+        features.append({
+            'type': 'Feature',
+            'id': feature.get('id'),
+            'properties': feature.get('properties', {}),
+            'geometry': {
+                'type': geometria['type'],
+                'coordinates': _arredondar(geometria['coordinates'], casas),
+            },
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def geometrias(nivel='medio', codigos=None, caminho=CAMINHO_GEOJSON):
+    tolerancia, casas = NIVEIS_DETALHE[nivel]
+    geojson = carregar_geojson(caminho)
+    versao = versao_geojson(caminho)
+    chave = (os.path.abspath(caminho), nivel)
+    with _lock:
+        em_cache = _cache_simplificado.get(chave)
+        if em_cache is None or em_cache[0] != versao:
+            em_cache = (versao, _simplificar(geojson, tolerancia, casas))
+            _cache_simplificado[chave] = em_cache
+        simplificado = em_cache[1]
+
+    if codigos is None:
+        return simplificado
+    codigos = set(codigos)
+    return {
+        'type': 'FeatureCollection',
+        'features': [f for f in simplificado['features'] if f.get('id') in codigos],
+    }
+
+
+def centroides(caminho=CAMINHO_GEOJSON):
+    # Ponto representativo (sempre dentro do polígono, ao contrário do
+    # centroide geométrico) de cada país, indexado pelo código ISO3 que a
+    # OMS publica em SpatialDimValueCode.
+    geojson = carregar_geojson(caminho)
+    versao = versao_geojson(caminho)
+    chave = os.path.abspath(caminho)
+    with _lock:
+        em_cache = _cache_centroides.get(chave)
+        if em_cache is None or em_cache[0] != versao:
+            pontos = {}
+            for feature in geojson['features']:
+                ponto = shape(feature['geometry']).representative_point()
+                pontos[feature.get('id')] = (round(ponto.y, 4), round(ponto.x, 4))
+            em_cache = (versao, pontos)
+            _cache_centroides[chave] = em_cache
+        return em_cache[1]
+
+
+def atualizar_geojson(url=URL_GEOJSON, destino=None, timeout=remoto.TIMEOUT):
+    destino = destino or CAMINHO_GEOJSON
+    # ttl=0 e esperar=True: sempre pergunta ao servidor (com ETag, então
+    # um arquivo igual não é baixado de novo) antes de gravar.
+    baixado = remoto.buscar(url, ttl=0, timeout=timeout, esperar=True)
+    with open(baixado, encoding='utf-8') as arquivo:
+        geojson = json.load(arquivo)
+    if geojson.get('type') != 'FeatureCollection' or not geojson.get('features'):
+        raise ValueError(f'{url} não devolveu uma FeatureCollection')
+
+    return arquivos.gravar_atomico(destino, json.dumps(geojson, separators=(',', ':')), modo='w')
@@ -0,0 +1,306 @@
+import functools
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from poluicao.agregados import CAUSA_TOTAL
+from poluicao.formatacao import formatar_numero, formatar_taxa
+from poluicao.instrumentacao import etapa
+
+# Uma cor por causa no detalhamento de um país, do azul do app para tons
+# mais claros.
+CORES_CAUSAS = ['#3867D6', '#4B7BEC', '#45AAF2', '#778CA3', '#A5B1C2', '#D1D8E0']
+
+# Dois níveis de cache LRU por view. O de fora é por objeto Agregados e
+# seleção, para que um rerun não consulte nem os rollups. O de dentro é pelos
+# números que a figura mostra (ver _conteudo): depois de uma recarga dos
+# dados, como a de atualizar, só as views cujos números mudaram montam a
+# figura de novo; as outras recebem a mesma figura, como o HTML do mapa.
+# As figuras são compartilhadas entre sessões e não devem ser alteradas.
+TAMANHO_CACHE = 64
+
+
+def _conteudo(dados):
+    # Série ou frame como tupla (hashable) com nomes, rótulos e valores.
+    if isinstance(dados, pd.Series):
+        return dados.index.name, dados.name, tuple(dados.index.tolist()), tuple(dados.tolist())
+    return (dados.index.name, dados.columns.name, tuple(dados.index.tolist()), tuple(dados.columns.tolist()),
+            tuple(map(tuple, dados.to_numpy().tolist())))
+
+
+def _serie(conteudo):
+    nome_indice, nome, indice, valores = conteudo
+    return pd.Series(list(valores), index=pd.Index(list(indice), name=nome_indice), name=nome)
+
+
+def _frame(conteudo):
+    nome_indice, nome_colunas, indice, colunas, valores = conteudo
+    return pd.DataFrame([list(linha) for linha in valores], index=pd.Index(list(indice), name=nome_indice),
+                        columns=pd.Index(list(colunas), name=nome_colunas))
+
+
+def _grafico_barras(totais, selecionado, valor_destaque):
+    colors = ['#EAEBF8' if rotulo != selecionado else '#3867D6' for rotulo in totais.index]
+
+    fig = go.Figure(data=[
+        go.Bar(
+            x=totais.index,
+            y=totais.values,
+            marker_color=colors,
+            textposition="none",
+            hoverinfo="x+y"
+        )
+    ])
+
+    fig.update_layout(
+        title="",
+        xaxis=dict(
+            tickangle=0,
+            tickmode="array",
+            tickvals=list(totais.index),
+            ticktext=[f"<br>".join(rotulo.split()) for rotulo in totais.index],
+        ),
+        yaxis=dict(
+            showticklabels=False,
+            showgrid=False
+        ),
+        font=dict(size=14, color="black"),
+        plot_bgcolor="rgba(0, 0, 0, 0)",
+        showlegend=False,
+        margin=dict(l=20, r=20, t=20, b=20),
+    )
+
+    fig.add_shape(
+        type="line",
+        x0=-0.5, x1=len(totais.index) - 0.5,
+        y0=valor_destaque, y1=valor_destaque,
+        line=dict(color="#3867D6", width=2, dash="dash")
+    )
+
+    fig.add_annotation(
+        x=len(totais.index) - 0.5,
+        y=valor_destaque,
+        text=formatar_numero(valor_destaque),
+        showarrow=False,
+        font=dict(color="#3867D6", size=12),
+        align="right",
+        xanchor="left",
+        yanchor="middle"
+    )
+    return fig
+
+
+@functools.lru_cache(maxsize=TAMANHO_CACHE)
+def _figura_barras(totais, selecionado, valor_destaque):
+    return _grafico_barras(_serie(totais), selecionado, valor_destaque)
+
+
+@functools.lru_cache(maxsize=TAMANHO_CACHE)
+def grafico_total_continente(agregados, continente):
+    with etapa('agregacao_view'):
+        totais = _conteudo(agregados.por_continente)
+    return _figura_barras(totais, continente, agregados.mortes_continente(continente))
+
+
+@functools.lru_cache(maxsize=TAMANHO_CACHE)
+def grafico_tendencia_continente(agregados, continente):
+    with etapa('agregacao_view'):
+        serie = _conteudo(agregados.serie_continente(continente))
+    return _figura_tendencia_continente(serie, continente)
+
+
+@functools.lru_cache(maxsize=TAMANHO_CACHE)
+def _figura_tendencia_continente(serie, continente):
+    dados_selecionados = _serie(serie).reset_index()
+    dados_selecionados['mortes_formatado'] = formatar_numero(dados_selecionados['mortes'])
+
+    fig = go.Figure()
+
+    fig.add_trace(
+        go.Scatter(
+            x=dados_selecionados['ano'],
+            y=dados_selecionados['mortes'],
+            mode='lines+markers+text',
+            name=continente,
+            line=dict(dash='dash', shape='spline', color="#3867D6"),
+            marker=dict(size=13, color="#3867D6"),
+            text=dados_selecionados['mortes_formatado'],
+            textposition="top center",
+            textfont=dict(size=12, color="#3867D6")
+        )
+    )
+
+    fig.update_layout(
+        xaxis=dict(showgrid=False, title=""),
+        yaxis=dict(showgrid=False, showticklabels=False, title=""),
+        plot_bgcolor="rgba(0, 0, 0, 0)",
+        font=dict(size=14, color="black"),
+        showlegend=False,
+        margin=dict(l=20, r=20, t=20, b=20),
+    )
+    return fig
+
+
+@functools.lru_cache(maxsize=TAMANHO_CACHE)
+def grafico_causa_anos(agregados, causa):
+    with etapa('agregacao_view'):
+        serie = _conteudo(agregados.serie_causa(causa))
+    return _figura_causa_anos(serie)
+
+
+@functools.lru_cache(maxsize=TAMANHO_CACHE)
+def _figura_causa_anos(serie):
+    dados_filtrados = _serie(serie).reset_index()
+    dados_filtrados['mortes_formatado'] = formatar_numero(dados_filtrados['mortes'])
+
+    fig = go.Figure()
+    fig.add_trace(
+        go.Scatter(
+            x=dados_filtrados['ano'],
+            y=dados_filtrados['mortes'],
+            mode='lines+markers+text',
+            marker=dict(size=13),
+            line=dict(dash='dash', shape='spline', color="#3867D6"),
+            text=dados_filtrados['mortes_formatado'],
+            textposition="top center",
+            textfont=dict(size=13, color="#3867D6")
+        )
+    )
+
+    fig.update_layout(legend_title_text='Causa')
+    fig.update_yaxes(showticklabels=False, title_text='', showgrid=False)
+    fig.update_xaxes(showgrid=False)
+    return fig
+
+
+@functools.lru_cache(maxsize=TAMANHO_CACHE)
+def grafico_tendencia_ano(agregados, ano=None):
+    with etapa('agregacao_view'):
+        serie = _conteudo(agregados.por_ano)
+    return _figura_tendencia_ano(serie, ano)
+
+
+@functools.lru_cache(maxsize=TAMANHO_CACHE)
+def _figura_tendencia_ano(serie, ano):
+    mortes_anuais = _serie(serie).reset_index()
+
+    fig = go.Figure()
+
+    fig.add_trace(
+        go.Scatter(
+            x=mortes_anuais['ano'],
+            y=mortes_anuais['mortes'],
+            mode='lines',
+            line=dict(dash='dash', shape='spline', color="#3867D6"),
+        )
+    )
+
+    if ano is not None:
+        ano_destaque = mortes_anuais[mortes_anuais['ano'] == ano]
+        fig.add_trace(
+            go.Scatter(
+                x=ano_destaque['ano'],
+                y=ano_destaque['mortes'],
+                mode='markers+text',
+                marker=dict(size=13, color="#3867D6"),
+                text=formatar_numero(ano_destaque['mortes']),
+                textposition="top center",
+                textfont=dict(size=12, color="#3867D6"),
+                name=f"Destaque {ano}"
+            )
+        )
+    else:
+        fig.add_trace(
+            go.Scatter(
+                x=mortes_anuais['ano'],
+                y=mortes_anuais['mortes'],
+                mode='markers+text',
+                marker=dict(size=13, color="#3867D6"),
+                text=formatar_numero(mortes_anuais['mortes']),
+                textposition="top center",
+                textfont=dict(size=12, color="#3867D6"),
+                name="Tendência"
+            )
+        )
+
+    fig.update_layout(
+        xaxis=dict(showgrid=False),
+        yaxis=dict(showgrid=False, showticklabels=False),
+        legend_title=None,
+        showlegend=False,
+        plot_bgcolor="white"
+    )
+    return fig
+
+
+@functools.lru_cache(maxsize=TAMANHO_CACHE)
+def grafico_total_causa(agregados, causa):
+    with etapa('agregacao_view'):
+        totais = _conteudo(agregados.por_causa.reindex(agregados.causas))
+    return _figura_barras(totais, causa, agregados.mortes_causa(causa))
+
+
+@functools.lru_cache(maxsize=TAMANHO_CACHE)
+def grafico_pais(agregados, pais):
+    with etapa('agregacao_view'):
+        serie = _conteudo(agregados.serie_pais(pais))
+    return _figura_pais(serie, agregados.contagem)
+
+
+@functools.lru_cache(maxsize=TAMANHO_CACHE)
+def _figura_pais(serie, contagem):
+    # Barras empilhadas com as causas de cada ano; o total ("Todas as
+    # causas") vai como rótulo acima de cada barra.
+    serie = _frame(serie)
+    causas = [causa for causa in serie.columns if causa != CAUSA_TOTAL]
+    totais = serie[CAUSA_TOTAL] if CAUSA_TOTAL in serie.columns else serie[causas].sum(axis=1)
+    # Taxas de uma mesma população se somam entre causas, mas precisam das
+    # casas decimais nos rótulos.
+    formatar, formato = (formatar_numero, ',') if contagem else (formatar_taxa, ',.1f')
+
+    fig = go.Figure()
+    for indice, causa in enumerate(causas):
+        fig.add_trace(
+            go.Bar(
+                x=serie.index,
+                y=serie[causa],
+                name=causa,
+                marker_color=CORES_CAUSAS[indice % len(CORES_CAUSAS)],
+                hovertemplate="%{x}: %{y:" + formato + "}<extra>" + causa + "</extra>",
+            )
+        )
+
+    fig.add_trace(
+        go.Scatter(
+            x=serie.index,
+            y=serie[causas].sum(axis=1),
+            mode='text',
+            text=formatar(totais),
+            textposition="top center",
+            textfont=dict(size=12, color="#3867D6"),
+            hoverinfo="skip",
+            showlegend=False,
+        )
+    )
+
+    fig.update_layout(
+        barmode='stack',
+        xaxis=dict(showgrid=False, title="", tickmode="array", tickvals=list(serie.index)),
+        yaxis=dict(showgrid=False, showticklabels=False, title=""),
+        plot_bgcolor="rgba(0, 0, 0, 0)",
+        font=dict(size=14, color="black"),
+        legend=dict(orientation="h", yanchor="top", y=-0.1),
+        margin=dict(l=20, r=20, t=20, b=20),
+    )
+    return fig
+
+
+GRAFICOS = (grafico_total_continente, grafico_tendencia_continente, grafico_causa_anos,
+            grafico_tendencia_ano, grafico_total_causa, grafico_pais)
+
+FIGURAS = (_figura_barras, _figura_tendencia_continente, _figura_causa_anos, _figura_tendencia_ano, _figura_pais)
+
+
+def limpar_cache():
+    for grafico in GRAFICOS + FIGURAS:
+        grafico.cache_clear()
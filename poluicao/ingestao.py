@@ -0,0 +1,198 @@
+import contextlib
+import json
+import os
+import re
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from poluicao import arquivos
+from poluicao.dados import COLUNAS_ORIGEM, RENOMEAR_COLUNAS, TAMANHO_BLOCO, preparar_painel
+from poluicao.instrumentacao import etapa
+
+LOJA_PADRAO = 'indicadores'
+
+COLUNAS_INGESTAO = ['IndicatorCode', 'Indicator'] + COLUNAS_ORIGEM
+
+RENOMEAR_INGESTAO = {
+    **RENOMEAR_COLUNAS,
+    'IndicatorCode': 'indicador',
+    'Indicator': 'indicador_nome',
+    'FactValueNumeric': 'valor',
+}
+
+# Formato longo da loja: uma linha por valor publicado, com todas as
+# dimensões que a OMS usa nos indicadores de poluição do ar.
+ESQUEMA_LOJA = pa.schema([
+    ('continente', pa.string()),
+    ('pais_code', pa.string()),
+    ('pais', pa.string()),
+    ('ano', pa.int16()),
+    ('dim1_code', pa.string()),
+    ('causa', pa.string()),
+    ('causa_code', pa.string()),
+    ('valor', pa.float64()),
+])
+
+COLUNAS_CATEGORICAS = ['continente', 'pais_code', 'pais', 'dim1_code', 'causa', 'causa_code']
+
+# Unidades dos indicadores no catálogo. Contagens (mortes, DALYs) podem ser
+# somadas entre países e anos; taxas (por 100 mil habitantes, padronizadas
+# por idade, percentuais) e concentrações médias não.
+CONTAGEM = 'contagem'
+TAXA = 'taxa'
+
+# Como a OMS nomeia os indicadores que não são contagens.
+_NOME_TAXA = re.compile(r'\brate\b|per 100|por 100|\btaxa|percent|%|concentra|\bmean\b|pm2\.5|pm10|µg|μg',
+                        re.IGNORECASE)
+
+# Valor "total" de cada dimensão que a OMS usa no Dim1 (sexo, área de
+# residência, faixa etária). Os demais valores são recortes do total e não
+# entram no painel, que somaria o mesmo valor várias vezes.
+TOTAIS_DIM1 = {'SEX_BTSX', 'RESIDENCEAREATYPE_TOTL', 'AGEGROUP_YEARSALL', 'AGEGROUP_ALLAGES'}
+
+# Só alguns indicadores ficam na memória por vez; trocar de indicador no
+# painel descarta o mais antigo.
+MAX_INDICADORES_EM_CACHE = 4
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def limpar_cache():
+    with _lock:
+        _cache.clear()
+
+
+def caminho_catalogo(loja=LOJA_PADRAO):
+    return os.path.join(loja, 'catalogo.json')
+
+
+def caminho_particao(codigo, loja=LOJA_PADRAO):
+    return os.path.join(loja, f'indicador={codigo}', 'dados.parquet')
+
+
+def indicadores(loja=LOJA_PADRAO):
+    # Código -> metadados ({'nome', 'unidade', 'linhas', 'fontes'}) de cada
+    # indicador.
+    caminho = caminho_catalogo(loja)
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def unidade(info):
+    # Catálogos gravados antes do campo 'unidade' caem na regra pelo nome.
+    return info.get('unidade') or (TAXA if _NOME_TAXA.search(info['nome']) else CONTAGEM)
+
+
+def _normalizar(bloco):
+    bloco = bloco.rename(columns=RENOMEAR_INGESTAO)
+    # Alguns indicadores publicam períodos como faixas ("2010-2015").
+    bloco['ano'] = pd.to_numeric(bloco['ano'], errors='coerce')
+    # Linhas sem região são agregados regionais/globais, que somariam o
+    # mesmo valor duas vezes; linhas sem valor não têm o que guardar.
+    bloco = bloco.dropna(subset=['indicador', 'continente', 'pais_code', 'ano', 'valor'])
+    # Indicadores sem a dimensão de causa já são o total de todas as causas.
+    bloco['causa'] = bloco['causa'].fillna('ALL CAUSES')
+    bloco['causa_code'] = bloco['causa_code'].fillna('GHECAUSES_ALL')
+    bloco['ano'] = bloco['ano'].astype('int16')
+    return bloco
+
+
+def _ler_blocos(caminho_csv, tamanho_bloco):
+    leitor = pd.read_csv(
+        caminho_csv,
+        usecols=COLUNAS_INGESTAO,
+        dtype={coluna: 'string' for coluna in COLUNAS_INGESTAO if coluna not in ('Period', 'FactValueNumeric')},
+        chunksize=tamanho_bloco,
+    )
+    with leitor:
+        for bloco in leitor:
+            yield _normalizar(bloco)
+
+
+def ingerir(caminhos_csv, loja=LOJA_PADRAO, tamanho_bloco=TAMANHO_BLOCO, taxas=()):
+    # Lê as exportações em blocos e distribui cada bloco pelas partições dos
+    # indicadores que ele contém: a memória usada depende do tamanho do
+    # bloco, não do tamanho nem do número de arquivos. A unidade vem do nome
+    # do indicador; os códigos em taxas são marcados como taxa de qualquer
+    # forma.
+    if isinstance(caminhos_csv, (str, os.PathLike)):
+        caminhos_csv = [caminhos_csv]
+
+    escritores = {}
+    novos = {}
+    # Uma escrita atômica por partição, todas concluídas juntas no fim: se a
+    # ingestão falhar, nenhuma partição é trocada.
+    with contextlib.ExitStack() as pilha:
+        for caminho_csv in caminhos_csv:
+            for bloco in _ler_blocos(caminho_csv, tamanho_bloco):
+                for codigo, grupo in bloco.groupby('indicador', sort=False):
+                    if codigo not in escritores:
+                        destino = caminho_particao(codigo, loja)
+                        os.makedirs(os.path.dirname(destino), exist_ok=True)
+                        temporario = pilha.enter_context(arquivos.escrita_atomica(destino))
+                        escritores[codigo] = pilha.enter_context(pq.ParquetWriter(temporario, ESQUEMA_LOJA))
+                        novos[codigo] = {'nome': grupo['indicador_nome'].iloc[0], 'linhas': 0, 'fontes': []}
+                    tabela = pa.Table.from_pandas(grupo[ESQUEMA_LOJA.names], schema=ESQUEMA_LOJA,
+                                                  preserve_index=False)
+                    escritores[codigo].write_table(tabela)
+                    novos[codigo]['linhas'] += len(grupo)
+                    fonte = os.path.abspath(caminho_csv)
+                    if fonte not in novos[codigo]['fontes']:
+                        novos[codigo]['fontes'].append(fonte)
+
+    # Partições de indicadores que não apareceram nesta ingestão continuam
+    # valendo; as que apareceram foram trocadas ao sair do bloco acima.
+    for codigo, info in novos.items():
+        info['unidade'] = TAXA if codigo in taxas else unidade(info)
+
+    os.makedirs(loja, exist_ok=True)
+    catalogo = {**indicadores(loja), **novos}
+    conteudo = json.dumps(dict(sorted(catalogo.items())), ensure_ascii=False, indent=2)
+    arquivos.gravar_atomico(caminho_catalogo(loja), conteudo, modo='w')
+    return novos
+
+
+def _so_totais(df, codigo):
+    # Linhas sem Dim1 ou com o valor total dela. Um Dim1 sem total
+    # conhecido não tem como ser mostrado sem somar recortes.
+    codigos = set(df['dim1_code'].dropna().astype(str).unique())
+    if not codigos:
+        return df
+    if not codigos & TOTAIS_DIM1:
+        raise ValueError(f'indicador {codigo!r}: Dim1 sem valor total conhecido ({", ".join(sorted(codigos))})')
+    return df[df['dim1_code'].isna() | df['dim1_code'].isin(TOTAIS_DIM1)]
+
+
+def carregar_indicador(codigo, loja=LOJA_PADRAO):
+    # Devolve o indicador no mesmo formato de carregar_dados, com "mortes"
+    # guardando o valor publicado, para que agregados e gráficos funcionem
+    # sem mudanças. Como lá, o frame é compartilhado e não deve ser alterado.
+    # Todos os anos publicados ficam (o corte em ANO_INICIAL é só do
+    # data.csv), só o total do Dim1 entra, e taxas continuam em float.
+    caminho = os.path.abspath(caminho_particao(codigo, loja))
+    if not os.path.exists(caminho):
+        raise KeyError(f'indicador {codigo!r} não está na loja {loja!r}')
+
+    with _lock:
+        assinatura = arquivos.assinatura(caminho)
+        em_cache = _cache.get(caminho)
+        if em_cache is not None and em_cache[0] == assinatura:
+            return em_cache[1]
+
+        info = indicadores(loja).get(codigo, {'nome': codigo})
+        with etapa('leitura_indicador'):
+            tabela = pq.read_table(caminho, read_dictionary=COLUNAS_CATEGORICAS)
+        df = preparar_painel(_so_totais(tabela.to_pandas(), codigo).rename(columns={'valor': 'mortes'}),
+                             ano_inicial=None, contagem=unidade(info) == CONTAGEM)
+
+        _cache.pop(caminho, None)
+        while len(_cache) >= MAX_INDICADORES_EM_CACHE:
+            del _cache[next(iter(_cache))]
+        _cache[caminho] = (assinatura, df)
+        return df
@@ -0,0 +1,141 @@
+import contextlib
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Tempos da execução corrente ficam por thread (o Streamlit roda cada
+# sessão na sua); os totais do processo alimentam o endpoint de métricas.
+_local = threading.local()
+_lock = threading.Lock()
+_totais = {}
+_servidor = None
+_saude = None
+
+
+def iniciar_execucao(escopo='pagina'):
+    # escopo: 'pagina' para o script inteiro, ou o nome da seção quando só
+    # um fragmento reexecuta (ver execucao).
+    _local.inicio = time.perf_counter()
+    _local.tempos = {}
+    _local.escopo = escopo
+
+
+def execucao_atual():
+    return dict(getattr(_local, 'tempos', {}))
+
+
+@contextlib.contextmanager
+def etapa(nome):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        tempos = getattr(_local, 'tempos', None)
+        if tempos is not None:
+            # Etapas que se repetem na mesma execução (a figura de cada
+            # seção, cada consulta SQL) somam.
+            tempos[nome] = tempos.get(nome, 0.0) + duracao
+        with _lock:
+            execucoes, soma, maximo = _totais.get(nome, (0, 0.0, 0.0))
+            _totais[nome] = (execucoes + 1, soma + duracao, max(maximo, duracao))
+
+
+def finalizar_execucao():
+    tempos = execucao_atual()
+    inicio = getattr(_local, 'inicio', None)
+    total = time.perf_counter() - inicio if inicio is not None else sum(tempos.values())
+    escopo = getattr(_local, 'escopo', None) or 'pagina'
+    _local.escopo = None
+    # A página soma em "execucao"; cada fragmento, em "execucao_<seção>".
+    chave = 'execucao' if escopo == 'pagina' else f'execucao_{escopo}'
+    with _lock:
+        execucoes, soma, maximo = _totais.get(chave, (0, 0.0, 0.0))
+        _totais[chave] = (execucoes + 1, soma + total, max(maximo, total))
+
+    logger.info(json.dumps({
+        'evento': 'execucao',
+        'escopo': escopo,
+        'total_ms': round(total * 1000, 3),
+        'etapas_ms': {nome: round(segundos * 1000, 3) for nome, segundos in tempos.items()},
+    }))
+    return total, tempos
+
+
+@contextlib.contextmanager
+def execucao(escopo):
+    # Para o corpo de um fragmento: dentro da execução da página as etapas
+    # ficam nela; num rerun só do fragmento, ele é a execução, com linha de
+    # log e amostra em /metrics próprias. O dict devolvido recebe 'total' e
+    # 'tempos' ao sair, ou fica vazio se a execução era a da página.
+    resultado = {}
+    if getattr(_local, 'escopo', None) is not None:
+        yield resultado
+        return
+    iniciar_execucao(escopo)
+    try:
+        yield resultado
+    finally:
+        resultado['total'], resultado['tempos'] = finalizar_execucao()
+
+
+def metricas_prometheus():
+    with _lock:
+        totais = dict(_totais)
+
+    linhas = [
+        '# HELP poluicao_etapa_segundos Tempo gasto em cada etapa de uma execução do painel.',
+        '# TYPE poluicao_etapa_segundos summary',
+    ]
+    for nome, (execucoes, soma, _) in sorted(totais.items()):
+        linhas.append(f'poluicao_etapa_segundos_sum{{etapa="{nome}"}} {soma:.6f}')
+        linhas.append(f'poluicao_etapa_segundos_count{{etapa="{nome}"}} {execucoes}')
+    linhas.append('# HELP poluicao_etapa_segundos_max Maior tempo observado em cada etapa.')
+    linhas.append('# TYPE poluicao_etapa_segundos_max gauge')
+    for nome, (_, _, maximo) in sorted(totais.items()):
+        linhas.append(f'poluicao_etapa_segundos_max{{etapa="{nome}"}} {maximo:.6f}')
+    return '\n'.join(linhas) + '\n'
+
+
+def registrar_saude(funcao):
+    # funcao() devolve um dict com ao menos a chave 'pronto'; passa a ser
+    # servido em /saude, com status 503 enquanto 'pronto' for falso.
+    global _saude
+    _saude = funcao
+
+
+class _Metricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        caminho = self.path.split('?')[0]
+        if caminho == '/metrics':
+            self._responder(200, 'text/plain; version=0.0.4; charset=utf-8', metricas_prometheus())
+        elif caminho == '/saude' and _saude is not None:
+            estado = _saude()
+            self._responder(200 if estado.get('pronto') else 503, 'application/json', json.dumps(estado))
+        else:
+            self.send_error(404)
+
+    def _responder(self, status, tipo, texto):
+        corpo = texto.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        logger.debug(formato, *args)
+
+
+def servir_metricas(porta, endereco='127.0.0.1'):
+    # Idempotente: o app chama a cada rerun, mas só um servidor sobe.
+    global _servidor
+    with _lock:
+        if _servidor is None:
+            _servidor = ThreadingHTTPServer((endereco, porta), _Metricas)
+            threading.Thread(target=_servidor.serve_forever, name='poluicao-metricas', daemon=True).start()
+        return _servidor
@@ -0,0 +1,106 @@
+import functools
+
+import folium
+import pandas as pd
+
+from poluicao.geo import CAMINHO_GEOJSON, centroides, geometrias, versao_geojson
+
+translations = {
+    "China": "China",
+    "India": "India",
+    "Pakistan": "Paquistao",
+    "Russian Federation": "Russia",
+    "Indonesia": "Indonesia",
+    "Nigeria": "Nigeria",
+    "United States of America": "Estados Unidos",
+    "Bangladesh": "Bangladesh",
+    "Egypt": "Egito",
+    "Japan": "Japao"
+}
+
+# Acima disso o mapa usa o nível de detalhe mais leve das fronteiras.
+LIMITE_DETALHE_MEDIO = 50
+
+# Países no mapa inicial: valor inicial do campo "Quantidade de países" do
+# app, e o mapa que o aquecimento e a versão estática pré-renderizam.
+N_PAISES_MAPA = 10
+
+
+def _link_detalhes(code):
+    # O mapa roda num iframe sem permissão de navegar a página do app; o
+    # link abre o detalhamento do país (?pais=) numa nova aba.
+    return f'<a href="?pais={code}" target="_blank" rel="noopener">Ver detalhes</a>'
+
+
+def _camada_marcadores(paises_mortes, pontos, detalhes=False):
+    # Todos os marcadores vão numa única camada GeoJSON em vez de um
+    # CircleMarker (e um Popup) por país.
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [pontos[code][1], pontos[code][0]]},
+            "properties": {
+                "pais": translations.get(country, country),
+                "mortes": f"{mortes:,}" if isinstance(mortes, int) else f"{mortes:,.1f}",
+                **({"detalhes": _link_detalhes(code)} if detalhes else {}),
+            },
+        }
+        for country, code, mortes in paises_mortes
+        if code in pontos
+    ]
+    campos, rotulos = ["pais", "mortes"], ["Pais:", "Mortes:"]
+    if detalhes:
+        campos, rotulos = campos + ["detalhes"], rotulos + [""]
+    return folium.GeoJson(
+        {"type": "FeatureCollection", "features": features},
+        name="marcadores",
+        marker=folium.CircleMarker(radius=2, color="red", fill=True, fill_color="red", fill_opacity=0.6),
+        popup=folium.GeoJsonPopup(fields=campos, aliases=rotulos, max_width=300),
+    )
+
+
+@functools.lru_cache(maxsize=32)
+def _renderizar(paises_mortes, mundo, caminho_geojson, versao_geo, detalhes):
+    top_paises = pd.DataFrame(list(paises_mortes), columns=["pais", "pais_code", "mortes"])
+    pontos = centroides(caminho_geojson)
+
+    nivel = 'medio' if len(top_paises) <= LIMITE_DETALHE_MEDIO else 'baixo'
+    codigos = None if mundo else top_paises["pais_code"]
+
+    m = folium.Map(location=[0, 0], zoom_start=1)
+
+    folium.Choropleth(
+        geo_data=geometrias(nivel, codigos=codigos, caminho=caminho_geojson),
+        name="choropleth",
+        data=top_paises,
+        columns=["pais_code", "mortes"],
+        key_on="feature.id",
+        fill_color="Blues",
+        fill_opacity=0.5,
+        line_opacity=0.5,
+        legend_name="Valor (em milhões)",
+        highlight=True
+    ).add_to(m)
+
+    if paises_mortes:
+        _camada_marcadores(paises_mortes, pontos, detalhes).add_to(m)
+
+    return m.get_root().render()
+
+
+def renderizar_mapa(top_paises, mundo=False, caminho_geojson=CAMINHO_GEOJSON, detalhes=False):
+    # O HTML é gerado em memória e reaproveitado enquanto os países
+    # exibidos, o modo e o arquivo (e a versão) das fronteiras forem os
+    # mesmos. Com detalhes=True o popup de cada país leva ao detalhamento
+    # do país no app.
+    # tolist() devolve int para contagens e float para taxas.
+    paises_mortes = tuple(zip(
+        top_paises["pais"],
+        top_paises["pais_code"],
+        top_paises["mortes"].tolist(),
+    ))
+    return _renderizar(paises_mortes, mundo, caminho_geojson, versao_geojson(caminho_geojson), detalhes)
+
+
+def limpar_cache():
+    _renderizar.cache_clear()
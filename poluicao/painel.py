@@ -0,0 +1,84 @@
+import functools
+
+from poluicao import agregados as modulo_agregados
+from poluicao import banco, compartilhado, dados, graficos, mapa
+from poluicao.agregados import obter_agregados
+from poluicao.banco import MOTORES, obter_agregados_sql
+from poluicao.compartilhado import obter_agregados_compartilhados
+from poluicao.dados import carregar_dados
+from poluicao.geo import CAMINHO_GEOJSON
+from poluicao.graficos import (
+    grafico_causa_anos,
+    grafico_pais,
+    grafico_tendencia_ano,
+    grafico_tendencia_continente,
+    grafico_total_causa,
+    grafico_total_continente,
+)
+from poluicao.ingestao import caminho_particao, carregar_indicador, indicadores
+from poluicao.instrumentacao import etapa
+from poluicao.mapa import N_PAISES_MAPA, renderizar_mapa
+from poluicao.remoto import buscar
+
+BACKENDS = ('pandas', 'compartilhado') + MOTORES
+
+
+def fonte(indicador=None, loja=None, caminho_csv='data.csv'):
+    # (origem, carregar): o arquivo que, ao mudar, invalida os caches, e a
+    # função que devolve o frame limpo; o CSV ou a partição do indicador.
+    if indicador:
+        return caminho_particao(indicador, loja), functools.partial(carregar_indicador, indicador, loja)
+    return caminho_csv, functools.partial(carregar_dados, caminho_csv)
+
+
+def carregar_agregados(origem, carregar, backend='pandas'):
+    # pandas mantém o frame e os agregados na memória de cada processo;
+    # compartilhado mapeia um cubo Arrow que todos os processos da máquina
+    # leem sem copiar; sqlite e duckdb consultam um banco indexado.
+    if backend == 'pandas':
+        with etapa('carga'):
+            df = carregar()
+        with etapa('agregados'):
+            return obter_agregados(df)
+    with etapa('agregados'):
+        if backend == 'compartilhado':
+            return obter_agregados_compartilhados(origem, carregar)
+        return obter_agregados_sql(origem, carregar, backend)
+
+
+def aquecer(backend='pandas', loja=None, caminho_csv='data.csv', url_geojson=None):
+    # Monta, antes da primeira sessão, o que a página inicial do app usa:
+    # dados limpos, agregados, as figuras de cada opção das views, o
+    # detalhamento do país padrão e o mapa inicial. As chamadas são as
+    # mesmas do app, então caem nos mesmos caches do processo.
+    catalogo = indicadores(loja) if loja else {}
+    agregados = carregar_agregados(*fonte(next(iter(catalogo), None), loja, caminho_csv), backend)
+
+    for grafico, opcoes in (
+        (grafico_total_continente, agregados.continentes),
+        (grafico_tendencia_continente, agregados.continentes),
+        (grafico_causa_anos, agregados.causas),
+        (grafico_tendencia_ano, [None] + agregados.anos),
+        (grafico_total_causa, agregados.causas),
+    ):
+        for opcao in opcoes:
+            grafico(agregados, opcao)
+    grafico_pais(agregados, agregados.pais_mais_mortes)
+
+    # Baixadas agora, as fronteiras ficam no cache em disco e o download
+    # em segundo plano do app devolve o mesmo arquivo na hora.
+    caminho_geojson = buscar(url_geojson, reserva=CAMINHO_GEOJSON) if url_geojson else CAMINHO_GEOJSON
+    renderizar_mapa(agregados.ranking_paises(N_PAISES_MAPA), caminho_geojson=caminho_geojson, detalhes=True)
+    return agregados
+
+
+def estado_caches():
+    # Entradas em cada cache do processo, para o endpoint de saúde.
+    return {
+        'dados': len(dados._cache),
+        'agregados': len(modulo_agregados._cache),
+        'banco': len(banco._cache),
+        'compartilhado': len(compartilhado._cache_agregados),
+        'graficos': sum(grafico.cache_info().currsize for grafico in graficos.GRAFICOS),
+        'mapa': mapa._renderizar.cache_info().currsize,
+    }
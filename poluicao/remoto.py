@@ -0,0 +1,198 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+
+from poluicao import arquivos
+
+logger = logging.getLogger(__name__)
+
+PASTA_CACHE = os.environ.get('POLUICAO_CACHE') or os.path.join(os.path.expanduser('~'), '.cache', 'poluicao')
+
+# (conexão, leitura) em segundos, repassado ao requests.
+TIMEOUT = (5, 30)
+
+TENTATIVAS = 3
+
+# Espera antes da segunda tentativa; dobra a cada nova falha.
+ESPERA_INICIAL = 0.5
+
+# Por quanto tempo uma cópia baixada vale sem perguntar de novo ao servidor.
+TTL = 24 * 60 * 60
+
+# Depois de uma falha, por quanto tempo buscar não tenta a mesma URL de
+# novo: devolve a reserva (ou a cópia vencida) na hora.
+ESPERA_APOS_FALHA = 5 * 60
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='poluicao-remoto')
+_revalidando = set()
+_pendentes = {}
+_lock = threading.Lock()
+_locks_url = {}
+
+
+def _lock_url(url):
+    with _lock:
+        return _locks_url.setdefault(url, threading.Lock())
+
+
+def caminhos_cache(url, pasta=None):
+    # Um arquivo com o corpo e outro com os metadados (ETag, Last-Modified,
+    # horário da última validação) por URL.
+    pasta = pasta or PASTA_CACHE
+    extensao = os.path.splitext(urlparse(url).path)[1][:10]
+    nome = hashlib.sha256(url.encode('utf-8')).hexdigest()[:24]
+    return os.path.join(pasta, nome + extensao), os.path.join(pasta, nome + '.meta.json')
+
+
+def _ler_meta(caminho_meta):
+    try:
+        with open(caminho_meta, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return {}
+
+
+def requisitar(url, cabecalhos=None, timeout=TIMEOUT, tentativas=TENTATIVAS):
+    # GET repetido em falhas de rede e em respostas 5xx, com espera
+    # crescente; erros 4xx não mudam na segunda tentativa e voltam na
+    # resposta, e a última falha sobe. Sem cache: para respostas que não
+    # vale guardar, como as páginas da API da OMS.
+    for tentativa in range(tentativas):
+        try:
+            resposta = requests.get(url, headers=cabecalhos or {}, timeout=timeout)
+            if resposta.status_code >= 500:
+                resposta.raise_for_status()
+            return resposta
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as erro:
+            if tentativa == tentativas - 1:
+                raise
+            espera = ESPERA_INICIAL * 2 ** tentativa
+            logger.warning('falha ao baixar %s (%s); nova tentativa em %.1fs', url, erro, espera)
+            time.sleep(espera)
+
+
+def baixar(url, pasta=None, timeout=TIMEOUT, tentativas=TENTATIVAS):
+    # Sempre pergunta ao servidor, com uma requisição condicional (ver
+    # requisitar); erros 4xx sobem direto.
+    caminho, caminho_meta = caminhos_cache(url, pasta)
+    with _lock_url(url):
+        meta = _ler_meta(caminho_meta) if os.path.exists(caminho) else {}
+        cabecalhos = {}
+        if meta.get('etag'):
+            cabecalhos['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            cabecalhos['If-Modified-Since'] = meta['last_modified']
+
+        resposta = requisitar(url, cabecalhos, timeout, tentativas)
+        if resposta.status_code == 304:
+            meta['validado_em'] = time.time()
+            meta.pop('falhou_em', None)
+        else:
+            resposta.raise_for_status()
+            arquivos.gravar_atomico(caminho, resposta.content)
+            meta = {
+                'url': url,
+                'etag': resposta.headers.get('ETag'),
+                'last_modified': resposta.headers.get('Last-Modified'),
+                'validado_em': time.time(),
+            }
+        arquivos.gravar_atomico(caminho_meta, json.dumps(meta), modo='w')
+        return caminho
+
+
+def _registrar_falha(url, pasta):
+    # Vai no arquivo de metadados, então vale para todos os processos que
+    # usam o mesmo cache; sem cópia local, baixar ignora o resto do arquivo.
+    _, caminho_meta = caminhos_cache(url, pasta)
+    with _lock_url(url):
+        meta = _ler_meta(caminho_meta)
+        meta['falhou_em'] = time.time()
+        arquivos.gravar_atomico(caminho_meta, json.dumps(meta), modo='w')
+
+
+def _em_espera(meta):
+    return time.time() - meta.get('falhou_em', 0) < ESPERA_APOS_FALHA
+
+
+def _revalidar(url, pasta, timeout, tentativas):
+    try:
+        baixar(url, pasta, timeout, tentativas)
+    except Exception as erro:
+        logger.warning('revalidação de %s falhou; mantendo a cópia local (%s)', url, erro)
+        _registrar_falha(url, pasta)
+    finally:
+        with _lock:
+            _revalidando.discard(url)
+
+
+def buscar(url, ttl=TTL, timeout=TIMEOUT, tentativas=TENTATIVAS, pasta=None, reserva=None, esperar=False):
+    # Devolve o caminho de uma cópia local de url:
+    # - dentro do ttl, a cópia em disco, sem tocar na rede;
+    # - vencida, a mesma cópia na hora, revalidada em segundo plano
+    #   (stale-while-revalidate), ou revalidada antes de voltar com
+    #   esperar=True, mantendo a cópia antiga se o servidor falhar;
+    # - sem cópia, baixa agora; se não der, devolve reserva (um arquivo
+    #   local equivalente) ou propaga o erro.
+    # Depois de uma falha, e por ESPERA_APOS_FALHA, a cópia vencida ou a
+    # reserva voltam na hora, sem nova tentativa.
+    caminho, caminho_meta = caminhos_cache(url, pasta)
+    meta = _ler_meta(caminho_meta)
+    if os.path.exists(caminho):
+        idade = time.time() - meta.get('validado_em', 0)
+        if idade < ttl or _em_espera(meta):
+            return caminho
+        if not esperar:
+            with _lock:
+                if url in _revalidando:
+                    return caminho
+                _revalidando.add(url)
+            _executor.submit(_revalidar, url, pasta, timeout, tentativas)
+            return caminho
+    elif reserva is not None and _em_espera(meta):
+        return reserva
+
+    try:
+        return baixar(url, pasta, timeout, tentativas)
+    except Exception as erro:
+        _registrar_falha(url, pasta)
+        if os.path.exists(caminho):
+            logger.warning('não foi possível revalidar %s; usando a cópia local (%s)', url, erro)
+            return caminho
+        if reserva is None:
+            raise
+        logger.warning('não foi possível baixar %s; usando %s (%s)', url, reserva, erro)
+        return reserva
+
+
+def buscar_em_segundo_plano(url, **opcoes):
+    # Para começar o download no topo do script e só esperar por ele onde
+    # o arquivo é usado; opcoes são as mesmas de buscar. Enquanto uma busca
+    # da mesma URL está em curso, devolve o mesmo futuro em vez de
+    # enfileirar outra.
+    with _lock:
+        futuro = _pendentes.get(url)
+        if futuro is None or futuro.done():
+            futuro = _executor.submit(buscar, url, **opcoes)
+            futuro.inicio = time.monotonic()
+            _pendentes[url] = futuro
+        return futuro
+
+
+def aguardar(futuro, reserva, espera=10):
+    # Nunca trava a página: se o download não terminar a tempo ou falhar,
+    # segue com a reserva e o futuro continua rodando para a próxima vez.
+    # A espera conta do início da busca, então um download lento segura no
+    # máximo espera segundos no total, não a cada rerun que o reencontra.
+    restante = espera - (time.monotonic() - getattr(futuro, 'inicio', time.monotonic()))
+    try:
+        return futuro.result(timeout=max(restante, 0))
+    except Exception as erro:
+        logger.warning('usando %s enquanto o download não termina (%r)', reserva, erro)
+        return reserva
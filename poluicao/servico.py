@@ -0,0 +1,282 @@
+import argparse
+import ast
+import asyncio
+import importlib
+import json
+import logging
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from poluicao.instrumentacao import registrar_saude, servir_metricas
+
+logger = logging.getLogger(__name__)
+
+PORTA = 8501
+
+# O processo i escuta o Streamlit em PORTA_PROCESSOS + i e a saúde e as
+# métricas em PORTA_PROCESSOS + DESLOCAMENTO_SAUDE + i, só em 127.0.0.1.
+PORTA_PROCESSOS = 8600
+DESLOCAMENTO_SAUDE = 100
+
+# Quanto esperar o aquecimento de cada processo antes de desistir.
+ESPERA_PRONTO = 600
+
+# Intervalo entre as verificações de saúde feitas pelo proxy.
+INTERVALO_SAUDE = 2
+
+OPCOES_STREAMLIT = [
+    '--server.address=127.0.0.1',
+    '--server.headless=true',
+    '--server.fileWatcherType=none',
+    '--server.runOnSave=false',
+    '--browser.gatherUsageStats=false',
+]
+
+
+def _porta_aberta(porta, endereco='127.0.0.1'):
+    try:
+        with socket.create_connection((endereco, porta), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+
+def _importar_dependencias(caminho_app):
+    # Os imports do topo do app (streamlit, pandas, plotly, folium...)
+    # ficam em sys.modules antes da primeira sessão.
+    with open(caminho_app, encoding='utf-8') as arquivo:
+        arvore = ast.parse(arquivo.read())
+    for no in arvore.body:
+        if isinstance(no, ast.Import):
+            modulos = [apelido.name for apelido in no.names]
+        elif isinstance(no, ast.ImportFrom) and not no.level:
+            modulos = [no.module]
+        else:
+            continue
+        for modulo in modulos:
+            importlib.import_module(modulo)
+
+
+def processo(caminho_app, porta, porta_saude):
+    # Um processo do painel: sobe /saude (e /metrics), importa o que o app
+    # importa, aquece os caches e só então abre a porta do Streamlit, que
+    # roda o app neste mesmo processo e encontra tudo pronto. Backend, loja
+    # e URL das fronteiras vêm das mesmas variáveis de ambiente do app.
+    from poluicao.painel import aquecer, estado_caches
+
+    estado = {'aquecido': False, 'aquecimento_s': None}
+
+    def saude():
+        streamlit = _porta_aberta(porta)
+        return {
+            'pid': os.getpid(),
+            'porta': porta,
+            'pronto': estado['aquecido'] and streamlit,
+            'aquecido': estado['aquecido'],
+            'streamlit': streamlit,
+            'aquecimento_s': estado['aquecimento_s'],
+            'caches': estado_caches(),
+        }
+
+    os.environ['POLUICAO_METRICAS_PORTA'] = str(porta_saude)
+    registrar_saude(saude)
+    servir_metricas(porta_saude)
+
+    inicio = time.perf_counter()
+    _importar_dependencias(caminho_app)
+    aquecer(
+        backend=os.environ.get('POLUICAO_BACKEND', 'pandas'),
+        loja=os.environ.get('POLUICAO_LOJA'),
+        url_geojson=os.environ.get('POLUICAO_GEOJSON_URL'),
+    )
+    estado['aquecimento_s'] = round(time.perf_counter() - inicio, 3)
+    estado['aquecido'] = True
+    logger.info('processo %s aquecido em %.1fs', os.getpid(), estado['aquecimento_s'])
+
+    from streamlit.web import cli
+    cli.main(['run', caminho_app, f'--server.port={porta}', *OPCOES_STREAMLIT], prog_name='streamlit')
+
+
+def _ler_saude(porta_saude):
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{porta_saude}/saude', timeout=2) as resposta:
+            return json.load(resposta)
+    except urllib.error.HTTPError as erro:
+        # 503 enquanto aquece: o corpo traz o estado mesmo assim.
+        return json.load(erro)
+    except (OSError, ValueError):
+        return {'pronto': False}
+
+
+class Servico:
+    # Sobe os processos e um proxy TCP na frente deles. Cada sessão do
+    # Streamlit é uma única conexão websocket, então distribuir conexões
+    # (para o processo pronto com menos conexões abertas) já mantém cada
+    # sessão inteira num processo, sem cookie de afinidade; os arquivos
+    # estáticos são os mesmos em todos.
+    def __init__(self, caminho_app='app.py', processos=2, porta_processos=PORTA_PROCESSOS):
+        self.caminho_app = caminho_app
+        self.portas = [porta_processos + i for i in range(processos)]
+        self.portas_saude = [porta + DESLOCAMENTO_SAUDE for porta in self.portas]
+        self.filhos = [None] * processos
+        self.saude = [{'pronto': False} for _ in range(processos)]
+        self.conexoes = [0] * processos
+        # Um segredo só para todos: o cookie XSRF emitido por um processo
+        # precisa valer nos outros.
+        self.ambiente = dict(os.environ)
+        self.ambiente.setdefault('STREAMLIT_SERVER_COOKIE_SECRET', secrets.token_hex(32))
+
+    def _iniciar(self, indice):
+        self.filhos[indice] = subprocess.Popen(
+            [sys.executable, '-m', 'poluicao.servico', self.caminho_app,
+             '--porta', str(self.portas[indice]), '--porta-saude', str(self.portas_saude[indice])],
+            env=self.ambiente,
+        )
+        self.saude[indice] = {'pronto': False}
+
+    def _aguardar(self, indices, espera):
+        limite = time.monotonic() + espera
+        pendentes = set(indices)
+        while pendentes:
+            for indice in list(pendentes):
+                if self.filhos[indice].poll() is not None:
+                    raise RuntimeError(f'o processo na porta {self.portas[indice]} saiu durante o aquecimento')
+                self.saude[indice] = _ler_saude(self.portas_saude[indice])
+                if self.saude[indice].get('pronto'):
+                    pendentes.discard(indice)
+            if time.monotonic() > limite:
+                raise TimeoutError(f'processos não ficaram prontos em {espera}s')
+            time.sleep(0.5)
+
+    def iniciar(self, espera=ESPERA_PRONTO):
+        # O primeiro processo aquece sozinho e grava os arquivos derivados
+        # (parquet, banco, Arrow); os demais já os encontram prontos.
+        self._iniciar(0)
+        self._aguardar([0], espera)
+        for indice in range(1, len(self.filhos)):
+            self._iniciar(indice)
+        self._aguardar(range(1, len(self.filhos)), espera)
+
+    def parar(self):
+        for filho in self.filhos:
+            if filho is not None and filho.poll() is None:
+                filho.terminate()
+        for filho in self.filhos:
+            if filho is not None:
+                try:
+                    filho.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    filho.kill()
+
+    def estado(self):
+        prontos = sum(1 for saude in self.saude if saude.get('pronto'))
+        return {
+            'pronto': prontos > 0,
+            'prontos': prontos,
+            'processos': [dict(saude, conexoes=conexoes) for saude, conexoes in zip(self.saude, self.conexoes)],
+        }
+
+    def _escolher(self):
+        prontos = [indice for indice, saude in enumerate(self.saude) if saude.get('pronto')]
+        return min(prontos or range(len(self.filhos)), key=lambda indice: self.conexoes[indice])
+
+    async def _vigiar(self):
+        # Processos que morrem são refeitos e ficam fora da distribuição até
+        # o novo aquecimento terminar.
+        while True:
+            for indice, filho in enumerate(self.filhos):
+                if filho.poll() is not None:
+                    logger.warning('processo na porta %s saiu (%s); reiniciando', self.portas[indice], filho.returncode)
+                    self._iniciar(indice)
+                self.saude[indice] = await asyncio.to_thread(_ler_saude, self.portas_saude[indice])
+            await asyncio.sleep(INTERVALO_SAUDE)
+
+    async def _responder_saude(self, escritor):
+        estado = self.estado()
+        corpo = json.dumps(estado).encode('utf-8')
+        status = b'200 OK' if estado['pronto'] else b'503 Service Unavailable'
+        escritor.write(b'HTTP/1.1 ' + status + b'\r\nContent-Type: application/json\r\n'
+                       b'Content-Length: ' + str(len(corpo)).encode() + b'\r\nConnection: close\r\n\r\n' + corpo)
+        await escritor.drain()
+
+    async def _atender(self, leitor, escritor):
+        destino = None
+        try:
+            try:
+                cabecalho = await leitor.readuntil(b'\r\n\r\n')
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            if cabecalho.split(b' ', 2)[1:2] == [b'/_saude']:
+                await self._responder_saude(escritor)
+                return
+
+            indice = self._escolher()
+            self.conexoes[indice] += 1
+            try:
+                leitor_destino, destino = await asyncio.open_connection('127.0.0.1', self.portas[indice])
+                destino.write(cabecalho)
+                await asyncio.gather(_copiar(leitor, destino), _copiar(leitor_destino, escritor))
+            finally:
+                self.conexoes[indice] -= 1
+        except OSError as erro:
+            logger.debug('conexão encerrada: %s', erro)
+        finally:
+            for lado in (destino, escritor):
+                if lado is not None:
+                    lado.close()
+
+    async def servir(self, porta=PORTA, endereco='0.0.0.0'):
+        servidor = await asyncio.start_server(self._atender, endereco, porta)
+        logger.info('servindo %s processos em http://%s:%s', len(self.filhos), endereco, porta)
+        vigia = asyncio.create_task(self._vigiar())
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            vigia.cancel()
+
+
+async def _copiar(leitor, escritor):
+    try:
+        while dados := await leitor.read(65536):
+            escritor.write(dados)
+            await escritor.drain()
+    finally:
+        # Meia-conexão: avisa o outro lado que não vem mais nada.
+        if escritor.can_write_eof() and not escritor.is_closing():
+            escritor.write_eof()
+
+
+def servir(caminho_app='app.py', processos=2, porta=PORTA, endereco='0.0.0.0',
+           porta_processos=PORTA_PROCESSOS, espera=ESPERA_PRONTO):
+    # Perfil de produção: processos aquecidos atrás de um proxy local; a
+    # porta pública só abre quando todos estão prontos.
+    servico = Servico(caminho_app, processos, porta_processos)
+    try:
+        servico.iniciar(espera)
+        asyncio.run(servico.servir(porta, endereco))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servico.parar()
+
+
+def main():
+    # Ponto de entrada de cada processo filho (ver Servico._iniciar).
+    parser = argparse.ArgumentParser(prog='python -m poluicao.servico')
+    parser.add_argument('app')
+    parser.add_argument('--porta', type=int, required=True)
+    parser.add_argument('--porta-saude', type=int, required=True)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    processo(args.app, args.porta, args.porta_saude)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.pedidos.append((self.path, dict(self.headers)))
+        status, cabecalhos, corpo = self.server.responder(self)
+        self.send_response(status)
+        for nome, valor in cabecalhos.items():
+            self.send_header(nome, valor)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+class Servidor:
+    # responder(pedido) devolve (status, cabeçalhos, corpo em bytes); os
+    # testes trocam a função conforme o cenário. pedidos guarda (caminho,
+    # cabeçalhos) de cada GET recebido.
+    def __init__(self):
+        self._http = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._http.daemon_threads = True
+        self._http.pedidos = []
+        self._http.responder = lambda pedido: (200, {}, b'')
+        threading.Thread(target=self._http.serve_forever, daemon=True).start()
+
+    @property
+    def pedidos(self):
+        return self._http.pedidos
+
+    @property
+    def responder(self):
+        return self._http.responder
+
+    @responder.setter
+    def responder(self, funcao):
+        self._http.responder = funcao
+
+    def url(self, caminho=''):
+        return f'http://127.0.0.1:{self._http.server_port}/{caminho.lstrip("/")}'
+
+    def fechar(self):
+        self._http.shutdown()
+        self._http.server_close()
+
+
+@pytest.fixture
+def servidor():
+    servidor = Servidor()
+    yield servidor
+    servidor.fechar()
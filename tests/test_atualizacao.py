@@ -0,0 +1,95 @@
+import json
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+
+from benchmarks.gerar_dados import gravar_dados
+from poluicao import atualizacao, dados, remoto
+
+# Registros por página na API simulada, para forçar o @odata.nextLink.
+POR_PAGINA = 2
+
+
+def _registro(pais, ano, sexo, causa, valor, data, tipo='COUNTRY', regiao=('AFR', 'Africa')):
+    return {'IndicatorCode': 'AIR_41', 'SpatialDimType': tipo, 'SpatialDim': pais,
+            'ParentLocationCode': regiao[0], 'ParentLocation': regiao[1], 'TimeDimType': 'YEAR', 'TimeDim': ano,
+            'Dim1Type': 'SEX', 'Dim1': sexo, 'Dim2Type': 'GHECAUSES', 'Dim2': causa, 'NumericValue': valor,
+            'Low': None, 'High': None, 'Value': str(int(valor)), 'Date': data}
+
+
+def _odata(registros):
+    def responder(pedido):
+        url = urlparse(pedido.path)
+        parametros = parse_qs(url.query)
+        partes = url.path.strip('/').split('/')
+        if partes[1] == 'DIMENSION':
+            corpo = {'value': [{'Code': 'XYZ', 'Title': 'Xyzland'}]}
+        else:
+            filtrados = [registro for registro in registros if registro['IndicatorCode'] == partes[1]]
+            if '$filter' in parametros:
+                desde = pd.Timestamp(parametros['$filter'][0].split('Date gt ')[1])
+                filtrados = [registro for registro in filtrados if pd.Timestamp(registro['Date']) > desde]
+            inicio = int(parametros.get('$skip', ['0'])[0])
+            corpo = {'value': filtrados[inicio:inicio + POR_PAGINA]}
+            if inicio + POR_PAGINA < len(filtrados):
+                filtro = f"$filter={parametros['$filter'][0].replace(' ', '%20')}&" if '$filter' in parametros else ''
+                corpo['@odata.nextLink'] = (f'http://{pedido.headers["Host"]}{url.path}?{filtro}'
+                                            f'$skip={inicio + POR_PAGINA}')
+        return 200, {'Content-Type': 'application/json'}, json.dumps(corpo).encode()
+    return responder
+
+
+@pytest.fixture
+def csv(tmp_path, monkeypatch):
+    monkeypatch.setattr(remoto, 'PASTA_CACHE', str(tmp_path / 'cache'))
+    caminho = gravar_dados(str(tmp_path / 'data.csv'))
+    dados.converter_csv(caminho)
+    return caminho
+
+
+def test_atualizar_corrige_parquet_como_a_conversao(servidor, csv, tmp_path):
+    # Todas as linhas da exportação sintética são de 2022-08-12.
+    servidor.responder = _odata([
+        _registro('NGA', 2019, 'SEX_BTSX', 'GHECAUSES_ALL', 99999.6, '2023-01-01T00:00:00.000Z',
+                  regiao=('EUR', 'Europe')),
+        _registro('NGA', 2015, 'SEX_MLE', 'GHE_LUNG', 5.0, '2023-01-02T00:00:00+00:00'),
+        _registro('XYZ', 2019, 'SEX_BTSX', 'GHE_IHD', 1234.4, '2023-01-03T00:00:00Z'),
+        _registro('AFR', 2019, 'SEX_BTSX', 'GHECAUSES_ALL', 1.0, '2023-01-04T00:00:00Z', tipo='REGION'),
+        _registro('BRA', 2010, 'SEX_BTSX', 'GHE_LUNG', 7.0, '2022-01-01T00:00:00Z'),
+    ])
+
+    resumo = atualizacao.atualizar(csv, url_base=servidor.url('api'))
+
+    assert (resumo['atualizadas'], resumo['novas']) == (2, 1)
+    assert resumo['sincronizado_ate'] == '2023-01-03T00:00:00.000Z'
+    assert any('$skip=' in caminho for caminho, _ in servidor.pedidos)
+
+    corrigido = dados.ler_parquet(dados.caminho_parquet(csv))
+    refeito = dados.ler_parquet(dados.converter_csv(csv, str(tmp_path / 'refeito.parquet')))
+    pd.testing.assert_frame_equal(corrigido, refeito)
+    nigeria = corrigido[(corrigido['pais_code'] == 'NGA') & (corrigido['ano'] == 2019)
+                        & (corrigido['causa_code'] == 'GHECAUSES_ALL')]
+    assert nigeria['continente'].astype(str).tolist() == ['Europa']
+    assert nigeria['mortes'].tolist() == [100000]
+    assert 'Xyzland' in set(corrigido['pais'].astype(str))
+    # As páginas da API não vão para o cache de downloads.
+    assert not (tmp_path / 'cache').exists()
+
+
+def test_atualizar_sem_novidades_nao_mexe_nos_arquivos(servidor, csv):
+    servidor.responder = _odata([
+        _registro('NGA', 2019, 'SEX_BTSX', 'GHECAUSES_ALL', 99999.6, '2023-01-01T00:00:00.000Z'),
+    ])
+    atualizacao.atualizar(csv, url_base=servidor.url('api'))
+    with open(csv, 'rb') as arquivo:
+        antes = arquivo.read()
+    servidor.pedidos.clear()
+
+    resumo = atualizacao.atualizar(csv, url_base=servidor.url('api'))
+
+    assert (resumo['atualizadas'], resumo['novas']) == (0, 0)
+    assert len(servidor.pedidos) == 1
+    assert '2023-01-01T00%3A00%3A00.000Z' in servidor.pedidos[0][0]
+    with open(csv, 'rb') as arquivo:
+        assert arquivo.read() == antes
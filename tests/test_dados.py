@@ -0,0 +1,71 @@
+import importlib.util
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from benchmarks.gerar_dados import gravar_dados
+from poluicao import dados, painel
+from poluicao.agregados import CAUSA_TOTAL, Agregados, agregar_csv
+
+
+@pytest.fixture
+def csv(tmp_path):
+    return gravar_dados(str(tmp_path / 'data.csv'))
+
+
+def _resumo(agregados):
+    # Números que o app mostra: cartões, rollups das views, rankings do
+    # mapa e o detalhamento de alguns países.
+    return {
+        'total': agregados.total_mortes,
+        'continente': agregados.continente_mais_mortes,
+        'pais': (agregados.pais_mais_mortes, agregados.mortes_pais_mais_mortes),
+        'continentes': agregados.continentes,
+        'causas': agregados.causas,
+        'anos': agregados.anos,
+        'codigos': agregados.codigos_paises,
+        'por_continente': agregados.por_continente.to_dict(),
+        'por_ano': agregados.por_ano.to_dict(),
+        'por_causa': agregados.por_causa.to_dict(),
+        'mortes_ano': [agregados.mortes_ano(ano) for ano in agregados.anos],
+        'ranking': agregados.ranking_paises(10).to_dict('list'),
+        'ranking_ano': agregados.ranking_paises(ano=2019, causa=CAUSA_TOTAL).to_dict('list'),
+        'series': {pais: agregados.serie_pais(pais).to_dict() for pais in agregados.paises[:5]},
+    }
+
+
+def test_csv_trocado_por_copia_mais_antiga_refaz_o_parquet(csv, tmp_path):
+    dados.carregar_dados(csv)
+    parquet = dados.caminho_parquet(csv)
+    assert os.path.exists(parquet)
+
+    # Outra exportação, com data de modificação anterior à do parquet.
+    outro = gravar_dados(str(tmp_path / 'outro' / 'data.csv'), semente=1)
+    antiga = os.stat(parquet).st_mtime - 3600
+    os.utime(outro, (antiga, antiga))
+    shutil.copy2(outro, csv)
+    assert os.stat(csv).st_mtime < os.stat(parquet).st_mtime
+
+    recarregado = dados.carregar_dados(csv)
+
+    refeito = dados.ler_parquet(dados.converter_csv(outro, str(tmp_path / 'refeito.parquet')))
+    pd.testing.assert_frame_equal(recarregado, refeito)
+
+
+def test_agregar_csv_igual_aos_agregados_do_frame(csv):
+    assert _resumo(agregar_csv(csv, tamanho_bloco=5_000)) == _resumo(Agregados(dados.carregar_dados(csv)))
+
+
+@pytest.mark.parametrize('backend', [
+    'compartilhado',
+    'sqlite',
+    pytest.param('duckdb', marks=pytest.mark.skipif(importlib.util.find_spec('duckdb') is None,
+                                                    reason='duckdb não instalado')),
+])
+def test_backends_devolvem_os_mesmos_numeros(csv, backend):
+    origem, carregar = painel.fonte(caminho_csv=csv)
+    referencia = _resumo(painel.carregar_agregados(origem, carregar, 'pandas'))
+
+    assert _resumo(painel.carregar_agregados(origem, carregar, backend)) == referencia
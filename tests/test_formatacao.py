@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+from poluicao import formatar_em_milhoes, formatar_numero, formatar_taxa
+
+
+def test_formatar_numero():
+    assert formatar_numero(999) == '999'
+    assert formatar_numero(1234) == '1.2K'
+    assert formatar_numero(999_950) == '1.0M'
+    assert formatar_numero(-2_345_678) == '-2.3M'
+    assert formatar_numero(np.array([5, 1234])).tolist() == ['5', '1.2K']
+
+
+def test_formatar_em_milhoes_e_taxa():
+    assert formatar_em_milhoes(7_654_321) == '7 milhões'
+    assert formatar_taxa(12.34) == '12.3'
+
+
+def test_valores_nao_finitos_viram_texto():
+    assert formatar_numero(np.nan) == 'nan'
+    assert formatar_em_milhoes(float('inf')) == 'inf'
+    assert formatar_taxa(-np.inf) == '-inf'
+    assert formatar_numero(pd.Series([1234.0, np.nan])).tolist() == ['1.2K', 'nan']
+    assert formatar_taxa([np.nan, 0.26]).tolist() == ['nan', '0.3']
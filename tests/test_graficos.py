@@ -0,0 +1,36 @@
+import pytest
+
+from benchmarks.gerar_dados import gerar_dados
+from poluicao import dados, graficos
+from poluicao.agregados import CAUSA_TOTAL, Agregados
+
+
+@pytest.fixture
+def limpo():
+    graficos.limpar_cache()
+    return dados.limpar_dados(gerar_dados()[dados.COLUNAS_ORIGEM].astype(dados.TIPOS_ORIGEM))
+
+
+def test_recarga_so_refaz_as_figuras_que_mudaram(limpo):
+    antes = Agregados(limpo)
+    pais = antes.pais_mais_mortes
+    continente = str(limpo.loc[limpo['pais'] == pais, 'continente'].iloc[0])
+    outro_pais = next(p for p in antes.paises if p != pais)
+    outro_continente = next(c for c in antes.continentes if c != continente)
+    figuras = {
+        'pais': graficos.grafico_pais(antes, pais),
+        'outro_pais': graficos.grafico_pais(antes, outro_pais),
+        'continente': graficos.grafico_tendencia_continente(antes, continente),
+        'outro_continente': graficos.grafico_tendencia_continente(antes, outro_continente),
+    }
+
+    # Mesma correção que atualizar faria: um número de um país.
+    alterado = limpo.copy()
+    linha = (alterado['pais'] == pais) & (alterado['ano'] == 2019) & (alterado['causa'] == CAUSA_TOTAL)
+    alterado.loc[linha, 'mortes'] += 1000
+    depois = Agregados(alterado)
+
+    assert graficos.grafico_pais(depois, pais) is not figuras['pais']
+    assert graficos.grafico_tendencia_continente(depois, continente) is not figuras['continente']
+    assert graficos.grafico_pais(depois, outro_pais) is figuras['outro_pais']
+    assert graficos.grafico_tendencia_continente(depois, outro_continente) is figuras['outro_continente']
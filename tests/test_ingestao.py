@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+from benchmarks.gerar_dados import COLUNAS_OMS
+from poluicao import ingestao
+from poluicao.agregados import Agregados
+
+AREAS = ['RESIDENCEAREATYPE_TOTL', 'RESIDENCEAREATYPE_URB', 'RESIDENCEAREATYPE_RUR']
+
+
+def _exportacao(destino, codigo, nome, dim1_codigos, valor=20.0):
+    # Exportação sem causa (Dim2 vazio), com um recorte no Dim1.
+    linhas = []
+    for pais, nome_pais in [('BRA', 'Brazil'), ('NGA', 'Nigeria')]:
+        for ano in (2018, 2019):
+            for dim1 in dim1_codigos:
+                linha = dict.fromkeys(COLUNAS_OMS, '')
+                linha.update({'IndicatorCode': codigo, 'Indicator': nome, 'ParentLocationCode': 'AMR',
+                              'ParentLocation': 'Americas', 'SpatialDimValueCode': pais, 'Location': nome_pais,
+                              'Period': ano, 'Dim1ValueCode': dim1, 'FactValueNumeric': valor})
+                linhas.append(linha)
+    pd.DataFrame(linhas, columns=COLUNAS_OMS).to_csv(destino, index=False)
+    return destino
+
+
+def test_indicador_por_area_usa_so_o_total(tmp_path):
+    csv = _exportacao(tmp_path / 'pm25.csv', 'SDGPM25',
+                      'Concentrations of fine particulate matter (PM2.5)', AREAS)
+    loja = str(tmp_path / 'loja')
+
+    novos = ingestao.ingerir(str(csv), loja=loja)
+    df = ingestao.carregar_indicador('SDGPM25', loja)
+
+    assert novos['SDGPM25']['unidade'] == ingestao.TAXA
+    assert len(df) == 4
+    ranking = Agregados(df).ranking_paises(ano=2019)
+    assert ranking['mortes'].tolist() == [20.0, 20.0]
+
+
+def test_dim1_sem_total_conhecido_e_recusado(tmp_path):
+    csv = _exportacao(tmp_path / 'x.csv', 'AIR_Y', 'Deaths', ['FOO_A', 'FOO_B'])
+    loja = str(tmp_path / 'loja')
+    ingestao.ingerir(str(csv), loja=loja)
+
+    with pytest.raises(ValueError, match='Dim1'):
+        ingestao.carregar_indicador('AIR_Y', loja)
@@ -0,0 +1,24 @@
+import time
+
+from poluicao import instrumentacao
+
+
+def test_etapa_repetida_soma_na_execucao():
+    instrumentacao.iniciar_execucao()
+    with instrumentacao.etapa('figura'):
+        time.sleep(0.05)
+    with instrumentacao.etapa('figura'):
+        time.sleep(0.01)
+    total, tempos = instrumentacao.finalizar_execucao()
+
+    assert tempos['figura'] >= 0.06
+    assert total >= tempos['figura']
+
+
+def test_execucao_de_fragmento_tem_escopo_proprio():
+    with instrumentacao.execucao('mapa') as resultado:
+        with instrumentacao.etapa('dados_mapa'):
+            pass
+
+    assert set(resultado['tempos']) == {'dados_mapa'}
+    assert 'poluicao_etapa_segundos_count{etapa="execucao_mapa"}' in instrumentacao.metricas_prometheus()
@@ -0,0 +1,146 @@
+import json
+import os
+import threading
+
+import pytest
+import requests
+
+from poluicao import remoto
+
+
+@pytest.fixture(autouse=True)
+def sem_espera(monkeypatch):
+    monkeypatch.setattr(remoto, 'ESPERA_INICIAL', 0)
+
+
+def _meta(url, pasta):
+    with open(remoto.caminhos_cache(url, pasta)[1], encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def test_baixar_grava_corpo_e_etag(servidor, tmp_path):
+    servidor.responder = lambda pedido: (200, {'ETag': '"v1"'}, b'{"a": 1}')
+    url = servidor.url('dados.json')
+
+    caminho = remoto.baixar(url, pasta=tmp_path)
+
+    with open(caminho, 'rb') as arquivo:
+        assert arquivo.read() == b'{"a": 1}'
+    assert _meta(url, tmp_path)['etag'] == '"v1"'
+
+
+def test_baixar_revalida_com_304(servidor, tmp_path):
+    def responder(pedido):
+        if pedido.headers.get('If-None-Match') == '"v1"':
+            return 304, {}, b''
+        return 200, {'ETag': '"v1"'}, b'original'
+    servidor.responder = responder
+    url = servidor.url('dados.json')
+    remoto.baixar(url, pasta=tmp_path)
+    validado_em = _meta(url, tmp_path)['validado_em']
+
+    caminho = remoto.baixar(url, pasta=tmp_path)
+
+    assert servidor.pedidos[1][1]['If-None-Match'] == '"v1"'
+    with open(caminho, 'rb') as arquivo:
+        assert arquivo.read() == b'original'
+    assert _meta(url, tmp_path)['validado_em'] >= validado_em
+
+
+def test_baixar_repete_em_5xx(servidor, tmp_path):
+    respostas = iter([(503, {}, b''), (502, {}, b''), (200, {}, b'ok')])
+    servidor.responder = lambda pedido: next(respostas)
+
+    caminho = remoto.baixar(servidor.url('dados.json'), pasta=tmp_path)
+
+    assert len(servidor.pedidos) == 3
+    with open(caminho, 'rb') as arquivo:
+        assert arquivo.read() == b'ok'
+
+
+def test_baixar_desiste_depois_das_tentativas(servidor, tmp_path):
+    servidor.responder = lambda pedido: (500, {}, b'')
+
+    with pytest.raises(requests.HTTPError):
+        remoto.baixar(servidor.url('dados.json'), pasta=tmp_path, tentativas=2)
+    assert len(servidor.pedidos) == 2
+
+
+def test_baixar_nao_repete_404(servidor, tmp_path):
+    servidor.responder = lambda pedido: (404, {}, b'')
+    url = servidor.url('dados.json')
+
+    with pytest.raises(requests.HTTPError):
+        remoto.baixar(url, pasta=tmp_path)
+    assert len(servidor.pedidos) == 1
+    assert not os.path.exists(remoto.caminhos_cache(url, tmp_path)[0])
+
+
+def test_requisitar_nao_grava_cache(servidor, tmp_path, monkeypatch):
+    monkeypatch.setattr(remoto, 'PASTA_CACHE', str(tmp_path / 'cache'))
+    servidor.responder = lambda pedido: (200, {}, b'{"value": []}')
+
+    assert remoto.requisitar(servidor.url('api/AIR_41')).json() == {'value': []}
+    assert not os.path.exists(tmp_path / 'cache')
+
+
+def test_buscar_usa_reserva_no_timeout_e_espera_antes_de_tentar_de_novo(servidor, tmp_path):
+    liberar = threading.Event()
+
+    def responder(pedido):
+        liberar.wait(5)
+        return 200, {}, b'tarde'
+    servidor.responder = responder
+    reserva = str(tmp_path / 'reserva.json')
+    url = servidor.url('dados.json')
+
+    try:
+        assert remoto.buscar(url, timeout=(1, 0.2), tentativas=1, pasta=tmp_path, reserva=reserva) == reserva
+        assert 'falhou_em' in _meta(url, tmp_path)
+        # Dentro de ESPERA_APOS_FALHA a reserva volta sem nova requisição.
+        assert remoto.buscar(url, timeout=(1, 0.2), tentativas=1, pasta=tmp_path, reserva=reserva) == reserva
+        assert len(servidor.pedidos) == 1
+    finally:
+        liberar.set()
+
+
+def test_buscar_sem_reserva_propaga_o_erro(servidor, tmp_path):
+    servidor.responder = lambda pedido: (404, {}, b'')
+
+    with pytest.raises(requests.HTTPError):
+        remoto.buscar(servidor.url('dados.json'), pasta=tmp_path)
+
+
+def test_buscar_usa_copia_vencida_se_o_servidor_falhar(servidor, tmp_path):
+    respostas = iter([(200, {}, b'antigo'), (503, {}, b'')])
+    servidor.responder = lambda pedido: next(respostas)
+    url = servidor.url('dados.json')
+    remoto.buscar(url, pasta=tmp_path)
+
+    caminho = remoto.buscar(url, ttl=0, tentativas=1, pasta=tmp_path, esperar=True)
+
+    with open(caminho, 'rb') as arquivo:
+        assert arquivo.read() == b'antigo'
+    assert len(servidor.pedidos) == 2
+
+
+def test_buscar_em_segundo_plano_reaproveita_busca_pendente(servidor, tmp_path):
+    liberar = threading.Event()
+
+    def responder(pedido):
+        liberar.wait(5)
+        return 200, {}, b'ok'
+    servidor.responder = responder
+    url = servidor.url('dados.json')
+    reserva = str(tmp_path / 'reserva.json')
+
+    primeiro = remoto.buscar_em_segundo_plano(url, pasta=tmp_path, reserva=reserva)
+    segundo = remoto.buscar_em_segundo_plano(url, pasta=tmp_path, reserva=reserva)
+    assert segundo is primeiro
+    assert remoto.aguardar(segundo, reserva, espera=0.1) == reserva
+
+    liberar.set()
+    caminho = primeiro.result(timeout=5)
+    assert caminho == remoto.caminhos_cache(url, tmp_path)[0]
+    assert len(servidor.pedidos) == 1
+    assert remoto.buscar_em_segundo_plano(url, pasta=tmp_path, reserva=reserva) is not primeiro